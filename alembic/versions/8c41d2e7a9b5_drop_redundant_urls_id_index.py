@@ -0,0 +1,26 @@
+"""Drop redundant index on urls.id (primary key is already indexed)
+
+Revision ID: 8c41d2e7a9b5
+Revises: 3dafbc67941e
+Create Date: 2026-10-15 21:55:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c41d2e7a9b5'
+down_revision: Union[str, None] = '3dafbc67941e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.drop_index(op.f('ix_urls_id'), table_name='urls')
+
+
+def downgrade() -> None:
+    op.create_index(op.f('ix_urls_id'), 'urls', ['id'], unique=False)
@@ -1,20 +1,60 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from shortener_app.config import settings
-from shortener_app.database.connection import engine, Base
+from shortener_app.database.connection import async_engine, Base
 from shortener_app.api.v1 import urls, redirect
+from shortener_app.cache.factory import CacheFactory, CacheBackend
+from shortener_app.queue.factory import QueueFactory, QueueBackend
+from shortener_app.queue.buffer import HitEventBuffer
 
 # Import models to ensure they're registered with Base
 from shortener_app.models import URL
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    App startup/shutdown.
+    
+    Startup: create database tables, create the cache and queue clients
+    (stored on app.state for the dependencies), pre-open their pooled
+    connections and start the hit event buffer.
+    Shutdown: publish any buffered hit events, then close connections.
+    """
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    app.state.cache = await CacheFactory.create(CacheBackend(settings.cache_backend))
+    app.state.queue = await QueueFactory.create(QueueBackend(settings.queue_backend))
+    # Open pooled connections now so early requests don't pay the handshake
+    await app.state.cache.warm_up(settings.redis_pool_size)
+    await app.state.queue.warm_up(1)  # Only the hit buffer's flusher task publishes
+    app.state.hit_buffer = HitEventBuffer(
+        queue=app.state.queue,
+        queue_name=settings.queue_name,
+        batch_size=settings.queue_publish_batch_size,
+        max_size=settings.queue_buffer_size
+    )
+    app.state.hit_buffer.start()
+    yield
+    await app.state.hit_buffer.stop()
+    await app.state.queue.close()
+    await app.state.cache.close()
+    # Closed clients must not be handed out again if the app restarts
+    QueueFactory.clear_instance()
+    CacheFactory.clear_instance()
+    await async_engine.dispose()
+
 
 # Create FastAPI app
 app = FastAPI(
     title=settings.app_name,
     version=settings.app_version,
     description="A URL shortener service built with FastAPI",
-    debug=settings.debug
+    debug=settings.debug,
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse  # orjson instead of stdlib json for every response
 )
 
 @app.get("/")
@@ -37,7 +77,13 @@ def health_check():
 
 
 ######## Include routers
+# Route order matters: Starlette matches routes in registration order.
+# The redirect router's catch-all /{short_code} must stay LAST, after the
+# docs routes (/docs, /redoc, /openapi.json - added by FastAPI()), "/",
+# "/health" and the /api/v1 routers; anything registered after it with a
+# single path segment would be shadowed. Redirects stay at the root (no
+# prefix) because short URLs are {base_url}/{short_code}.
 app.include_router(urls.router, prefix="/api/v1")
-app.include_router(redirect.router)
+app.include_router(redirect.router)  # Keep last
 
 
@@ -0,0 +1,9 @@
+"""
+API v1 routers.
+
+Both routers are async (injected services, no blocking DB calls on the event loop).
+"""
+
+from . import urls, redirect
+
+__all__ = ["urls", "redirect"]
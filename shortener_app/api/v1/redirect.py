@@ -1,36 +1,53 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.responses import RedirectResponse
 from datetime import datetime, timezone
+from shortener_app.config import settings
+from shortener_app.schemas.url import SHORT_CODE_RE
 from shortener_app.services.url_service import URLService
 from shortener_app.queue.models import HitEvent
-from shortener_app.dependencies import get_url_service, get_queue
-from shortener_app.queue.strategies import QueueStrategy
-from shortener_app.config import settings
+from shortener_app.dependencies import get_url_service, get_hit_buffer
+from shortener_app.queue.buffer import HitEventBuffer
 
 router = APIRouter(tags=["redirect"])
 
 
 @router.get("/{short_code}")
 async def redirect_to_long_url(
-    short_code: str,
     request: Request,
+    short_code: str,
     url_service: URLService = Depends(get_url_service),
-    queue: QueueStrategy = Depends(get_queue)
+    hit_buffer: HitEventBuffer = Depends(get_hit_buffer)
 ):
     """
     Redirect to the original URL.
     
     Flow (optimized for performance):
     1. Get long_url from cache (ASYNC I/O - ~0.1ms)
-    2. Publish hit event to queue (ASYNC I/O - ~0.1ms)
-    3. Redirect immediately (total ~0.2ms)
+    2. Buffer hit event in memory (no I/O - published in batches)
+    3. Redirect immediately (total ~0.1ms)
+       302 by default; 301 + Cache-Control when settings.permanent_redirects
     
     Hit tracking is processed asynchronously by worker,
     so it doesn't slow down the redirect!
     
-    Note: This is async for cache.get() and queue.publish() (both I/O operations).
-    DB query is sync but only happens on cache miss (rare).
+    Note: Cache and DB I/O are both awaited (DB only on cache miss),
+    so a slow lookup never blocks other requests on the event loop.
+    
+    The hit is buffered only after the lookup succeeds. Buffering is an
+    in-memory put (the queue round-trip happens in the background), so
+    running it concurrently with the lookup would save nothing - and it
+    would record hits for unknown codes (404s, scanner traffic).
+    
+    Malformed codes get a 404 without any lookup: this catch-all route
+    also receives requests like /favicon.ico, which are not found, not
+    invalid input.
     """
+    if not SHORT_CODE_RE.fullmatch(short_code):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Short URL not found or inactive"
+        )
+    
     # Step 1: Get long URL using cache-aside pattern (ASYNC)
     long_url = await url_service.get_long_url_for_redirect(short_code)
     
@@ -40,7 +57,7 @@ async def redirect_to_long_url(
             detail="Short URL not found or inactive"
         )
     
-    # Step 2: Publish hit event to queue (async, non-blocking)
+    # Step 2: Buffer hit event (background task publishes batches to queue)
     # Worker will process this and update database
     hit_event = HitEvent(
         short_code=short_code,
@@ -50,8 +67,15 @@ async def redirect_to_long_url(
         referer=request.headers.get("referer"),
     )
     
-    # Publish to queue (doesn't block - fire and forget)
-    await queue.publish(settings.queue_name, hit_event)
+    # Enqueue in memory (no network round-trip on the request path)
+    await hit_buffer.put(hit_event)
     
     # Step 3: Redirect immediately (user doesn't wait for DB write!)
-    return RedirectResponse(url=long_url, status_code=status.HTTP_302_FOUND)
+    if not settings.permanent_redirects:
+        return RedirectResponse(url=long_url, status_code=status.HTTP_302_FOUND)
+    
+    # Permanent redirect: browsers/CDNs may serve repeat clicks from their cache,
+    # so only the first click per client is tracked above
+    response = RedirectResponse(url=long_url, status_code=status.HTTP_301_MOVED_PERMANENTLY)
+    response.headers["Cache-Control"] = f"public, max-age={settings.redirect_cache_max_age}"
+    return response
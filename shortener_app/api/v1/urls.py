@@ -1,5 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from shortener_app.schemas.url import URLCreate, URLResponse, URLStats
+from fastapi import APIRouter, Depends, HTTPException, Path, status
+from shortener_app.schemas.url import URLCreate, URLResponse, URLStats, SHORT_CODE_PATTERN
 from shortener_app.services.url_service import URLService
 from shortener_app.dependencies import get_url_service
 
@@ -11,16 +11,16 @@ async def create_short_url(
     url_data: URLCreate,
     url_service: URLService = Depends(get_url_service)
 ):
-    """Create a new short URL (async for cache I/O)"""
+    """Create a new short URL (async for DB and cache I/O)"""
     return await url_service.create_short_url(url_data.long_url)
 
 
 @router.get("/{short_code}", response_model=URLResponse)
 async def get_url_info(
-    short_code: str,
+    short_code: str = Path(..., pattern=SHORT_CODE_PATTERN),
     url_service: URLService = Depends(get_url_service)
 ):
-    """Get information about a short URL (async for interface consistency)"""
+    """Get information about a short URL (async DB I/O)"""
     url = await url_service.get_url_by_short_code(short_code)
     if not url:
         raise HTTPException(
@@ -32,10 +32,10 @@ async def get_url_info(
 
 @router.get("/{short_code}/stats", response_model=URLStats)
 async def get_url_stats(
-    short_code: str,
+    short_code: str = Path(..., pattern=SHORT_CODE_PATTERN),
     url_service: URLService = Depends(get_url_service)
 ):
-    """Get statistics for a short URL (async for interface consistency)"""
+    """Get statistics for a short URL (async DB I/O)"""
     stats = await url_service.get_url_stats(short_code)
     if not stats:
         raise HTTPException(
@@ -47,10 +47,10 @@ async def get_url_stats(
 
 @router.delete("/{short_code}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_url(
-    short_code: str,
+    short_code: str = Path(..., pattern=SHORT_CODE_PATTERN),
     url_service: URLService = Depends(get_url_service)
 ):
-    """Delete a short URL (async for cache invalidation)"""
+    """Delete a short URL (async for DB I/O and cache invalidation)"""
     success = await url_service.delete_url(short_code)
     if not success:
         raise HTTPException(
@@ -3,7 +3,7 @@ Cache module for URL shortener.
 Implements Strategy Pattern for flexible cache backends.
 """
 
-from .strategies import CacheStrategy, RedisCache, InMemoryCache, NullCache
+from .strategies import CacheStrategy, RedisCache, InMemoryCache, NullCache, TieredCache
 from .factory import CacheFactory
 
 __all__ = [
@@ -11,6 +11,7 @@ __all__ = [
     "RedisCache", 
     "InMemoryCache",
     "NullCache",
+    "TieredCache",
     "CacheFactory",
 ]
 
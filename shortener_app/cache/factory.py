@@ -3,10 +3,14 @@ Factory for creating cache instances.
 Simple, clean factory with singleton caching.
 """
 
+import asyncio
+import logging
 from enum import Enum
-from .strategies import CacheStrategy, RedisCache, InMemoryCache, NullCache
+from .strategies import CacheStrategy, RedisCache, InMemoryCache, NullCache, TieredCache
 from shortener_app.config import settings
 
+logger = logging.getLogger(__name__)
+
 
 class CacheBackend(Enum):
     """Available cache backends"""
@@ -18,68 +22,96 @@ class CacheBackend(Enum):
 class CacheFactory:
     """
     Simple factory for creating cache instances.
-    
+
     Uses Singleton Pattern - creates instance once, reuses it.
     Gets configuration from settings (not passed as parameters).
+
+    Creation is guarded by an asyncio.Lock so concurrent callers
+    can't open (and PING) two Redis clients at once.
     """
-    
+
     _instance: CacheStrategy = None  # Single cached instance
-    
+    _lock = asyncio.Lock()
+
     @classmethod
-    def create(cls, backend: CacheBackend) -> CacheStrategy:
+    async def create(cls, backend: CacheBackend) -> CacheStrategy:
         """
         Create or return cached cache instance.
-        
+
+        Async because the Redis client is async (redis.asyncio) and the
+        connection test (PING) must be awaited. Called once at app startup.
+
         Args:
             backend: Type of cache backend (from enum)
-            
+
         Returns:
             Singleton cache instance
         """
         # Return cached instance if exists
         if cls._instance is not None:
             return cls._instance
-        
-        # Create new instance based on backend type
+
+        async with cls._lock:
+            # Another caller may have created it while we waited
+            if cls._instance is None:
+                cls._instance = await cls._build(backend)
+
+        return cls._instance
+
+    @classmethod
+    async def _build(cls, backend: CacheBackend) -> CacheStrategy:
+        """Create new instance based on backend type"""
         if backend == CacheBackend.REDIS:
-            import redis
-            
+            from redis.asyncio import BlockingConnectionPool, Redis
+
             try:
                 # Get Redis URL from settings (not from parameters!)
-                redis_client = redis.from_url(
+                # Async client: awaits don't block the event loop
+                # Blocking pool: past redis_pool_size, requests wait up to
+                # `timeout` for a free connection instead of failing with
+                # "Too many connections"
+                pool = BlockingConnectionPool.from_url(
                     settings.redis_url,
+                    max_connections=settings.redis_pool_size,
+                    timeout=2,
                     decode_responses=False,
                     socket_connect_timeout=2,  # Reduced timeout
-                    socket_timeout=2,          # Reduced timeout
+                    socket_timeout=2,          # Stalled Redis: fail over to the DB, don't hang
                 )
-                
+                redis_client = Redis.from_pool(pool)  # Client owns the pool: aclose() closes it
+
                 # Test connection immediately
-                redis_client.ping()
-                
-                cls._instance = RedisCache(redis_client)
-                print(f"✅ Redis cache initialized")
-                
+                await redis_client.ping()
+
+                logger.info("Redis cache initialized")
+                cache = RedisCache(redis_client)
+
+                # Local LRU in front of Redis: hot keys skip the network round-trip
+                if settings.cache_l1_max_size > 0:
+                    return TieredCache(
+                        cache,
+                        l1_max_size=settings.cache_l1_max_size,
+                        l1_ttl=settings.cache_l1_ttl,
+                    )
+                return cache
+
             except Exception as e:
-                print(f"⚠️  Redis connection failed: {e}")
-                print(f"⚠️  Falling back to in-memory cache")
-                cls._instance = InMemoryCache()
-                print("✅ In-memory cache initialized (fallback)")
-            
+                logger.warning("Redis connection failed: %s", e)
+                logger.warning("Falling back to in-memory cache")
+                return InMemoryCache()
+
         elif backend == CacheBackend.MEMORY:
-            cls._instance = InMemoryCache()
-            print("✅ In-memory cache initialized")
-            
+            logger.info("In-memory cache initialized")
+            return InMemoryCache()
+
         elif backend == CacheBackend.NULL:
-            cls._instance = NullCache()
-            print("✅ Null cache initialized")
-            
+            logger.info("Null cache initialized")
+            return NullCache()
+
         else:
             raise ValueError(f"Unknown cache backend: {backend}")
-        
-        return cls._instance
-    
+
     @classmethod
     def clear_instance(cls):
         """Clear cached instance (for testing)"""
         cls._instance = None
-
@@ -3,11 +3,17 @@ Cache strategies using Strategy Pattern.
 Allows switching between different cache backends (Redis, In-Memory, Null).
 """
 
+import asyncio
+import time
 from abc import ABC, abstractmethod
-from typing import Optional, Dict, Any
-import json
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Tuple
 from datetime import timedelta
 
+# Cached in place of a long URL for codes that don't exist (negative caching),
+# so repeated lookups of unknown codes (e.g. scanners) don't reach the database
+CACHE_MISS_SENTINEL = "__MISS__"
+
 
 class CacheStrategy(ABC):
     """
@@ -32,6 +38,19 @@ class CacheStrategy(ABC):
         """
         pass
     
+    @abstractmethod
+    async def mget(self, keys: List[str]) -> List[Optional[str]]:
+        """
+        Get multiple values from cache in one round-trip.
+        
+        Args:
+            keys: Cache keys
+            
+        Returns:
+            Cached values in the same order as keys (None for misses)
+        """
+        pass
+    
     @abstractmethod
     async def set(self, key: str, value: str, ttl: int = 3600) -> bool:
         """
@@ -47,6 +66,23 @@ class CacheStrategy(ABC):
         """
         pass
     
+    async def mset(self, items: Dict[str, str], ttl: int = 3600) -> bool:
+        """
+        Set multiple values with the same TTL.
+        
+        Default implementation sets them one by one; backends with a
+        network round-trip override this to write them all at once.
+        
+        Args:
+            items: Mapping of cache key to value
+            ttl: Time to live in seconds (default: 1 hour)
+            
+        Returns:
+            True if all were set, False otherwise
+        """
+        results = [await self.set(key, value, ttl) for key, value in items.items()]
+        return all(results)
+    
     @abstractmethod
     async def delete(self, key: str) -> bool:
         """
@@ -82,6 +118,20 @@ class CacheStrategy(ABC):
             True if successful
         """
         pass
+    
+    async def warm_up(self, connections: int):
+        """
+        Open connections ahead of traffic (called on app startup).
+        No-op by default (backends without a connection pool).
+        
+        Args:
+            connections: Number of pooled connections to open
+        """
+        pass
+    
+    async def close(self):
+        """Release connections (called on app shutdown). No-op by default."""
+        pass
 
 
 class RedisCache(CacheStrategy):
@@ -103,31 +153,55 @@ class RedisCache(CacheStrategy):
         Initialize Redis cache.
         
         Args:
-            redis_client: Redis client instance (redis.Redis)
+            redis_client: Async Redis client instance (redis.asyncio.Redis)
         """
         self.redis = redis_client
     
     async def get(self, key: str) -> Optional[str]:
         """Get value from Redis (async I/O)"""
         try:
-            value = self.redis.get(key)
+            value = await self.redis.get(key)
             return value.decode('utf-8') if value else None
         except Exception as e:
             print(f"Redis get error: {e}")
             return None
     
+    async def mget(self, keys: List[str]) -> List[Optional[str]]:
+        """Get multiple values from Redis with a single MGET (async I/O)"""
+        if not keys:
+            return []
+        try:
+            values = await self.redis.mget(keys)
+            return [value.decode('utf-8') if value else None for value in values]
+        except Exception as e:
+            print(f"Redis mget error: {e}")
+            return [None] * len(keys)
+    
     async def set(self, key: str, value: str, ttl: int = 3600) -> bool:
         """Set value in Redis with TTL (async I/O)"""
         try:
-            return self.redis.setex(key, ttl, value)
+            return await self.redis.setex(key, ttl, value)
         except Exception as e:
             print(f"Redis set error: {e}")
             return False
     
+    async def mset(self, items: Dict[str, str], ttl: int = 3600) -> bool:
+        """Set multiple values with TTL in one round-trip (pipelined SETEX)"""
+        if not items:
+            return True
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for key, value in items.items():
+                pipe.setex(key, ttl, value)
+            return all(await pipe.execute())
+        except Exception as e:
+            print(f"Redis mset error: {e}")
+            return False
+    
     async def delete(self, key: str) -> bool:
         """Delete key from Redis (async I/O)"""
         try:
-            return bool(self.redis.delete(key))
+            return bool(await self.redis.delete(key))
         except Exception as e:
             print(f"Redis delete error: {e}")
             return False
@@ -135,7 +209,7 @@ class RedisCache(CacheStrategy):
     async def exists(self, key: str) -> bool:
         """Check if key exists in Redis (async I/O)"""
         try:
-            return bool(self.redis.exists(key))
+            return bool(await self.redis.exists(key))
         except Exception as e:
             print(f"Redis exists error: {e}")
             return False
@@ -143,11 +217,27 @@ class RedisCache(CacheStrategy):
     async def clear(self) -> bool:
         """Clear all Redis keys (use with caution!)"""
         try:
-            self.redis.flushdb()
+            await self.redis.flushdb()
             return True
         except Exception as e:
             print(f"Redis clear error: {e}")
             return False
+    
+    async def warm_up(self, connections: int):
+        """
+        Fill the connection pool with concurrent PINGs.
+        
+        The pool opens sockets lazily, so without this the first requests
+        pay the TCP (and AUTH) handshake on the redirect path.
+        """
+        try:
+            await asyncio.gather(*(self.redis.ping() for _ in range(connections)))
+        except Exception as e:
+            print(f"Redis warm-up error: {e}")
+    
+    async def close(self):
+        """Close the Redis connection pool"""
+        await self.redis.aclose()
 
 
 class InMemoryCache(CacheStrategy):
@@ -176,6 +266,10 @@ class InMemoryCache(CacheStrategy):
         """Get value from memory (instant, but async for interface)"""
         return self._cache.get(key)
     
+    async def mget(self, keys: List[str]) -> List[Optional[str]]:
+        """Get multiple values from memory (instant, but async for interface)"""
+        return [self._cache.get(key) for key in keys]
+    
     async def set(self, key: str, value: str, ttl: int = 3600) -> bool:
         """
         Set value in memory (instant, but async for interface).
@@ -186,6 +280,11 @@ class InMemoryCache(CacheStrategy):
         self._cache[key] = value
         return True
     
+    async def mset(self, items: Dict[str, str], ttl: int = 3600) -> bool:
+        """Set multiple values in memory (TTL ignored, like set)"""
+        self._cache.update(items)
+        return True
+    
     async def delete(self, key: str) -> bool:
         """Delete key from memory (instant, but async for interface)"""
         if key in self._cache:
@@ -220,10 +319,18 @@ class NullCache(CacheStrategy):
         """Always returns None (cache miss)"""
         return None
     
+    async def mget(self, keys: List[str]) -> List[Optional[str]]:
+        """Always returns all misses"""
+        return [None] * len(keys)
+    
     async def set(self, key: str, value: str, ttl: int = 3600) -> bool:
         """Pretends to set but does nothing"""
         return True
     
+    async def mset(self, items: Dict[str, str], ttl: int = 3600) -> bool:
+        """Pretends to set but does nothing"""
+        return True
+    
     async def delete(self, key: str) -> bool:
         """Pretends to delete but does nothing"""
         return True
@@ -236,3 +343,119 @@ class NullCache(CacheStrategy):
         """Pretends to clear but does nothing"""
         return True
 
+
+class TieredCache(CacheStrategy):
+    """
+    Two-level cache: bounded in-process LRU (L1) in front of another cache (L2).
+
+    Hot short codes are served from process memory without a Redis
+    round-trip; everything else falls through to L2.
+
+    - get: L1 first, then L2 (an L2 hit populates L1)
+    - set/delete: write-through to both levels
+
+    L1 entries expire after l1_ttl seconds, which bounds how long a
+    delete made by another server can stay invisible here.
+
+    Negative entries (CACHE_MISS_SENTINEL) are kept in L2 only: a code
+    created on another server must not keep 404ing here from a local
+    copy that its delete can't reach.
+    """
+
+    def __init__(self, l2: CacheStrategy, l1_max_size: int = 10000, l1_ttl: int = 60):
+        """
+        Initialize tiered cache.
+
+        Args:
+            l2: Shared cache behind the local LRU (usually RedisCache)
+            l1_max_size: Maximum number of entries kept in process memory
+            l1_ttl: Lifetime of an L1 entry in seconds
+        """
+        self.l2 = l2
+        self.l1_max_size = l1_max_size
+        self.l1_ttl = l1_ttl
+        # key -> (value, expires_at); order = recency (most recent last)
+        self._l1: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+
+    def _l1_get(self, key: str) -> Optional[str]:
+        """Get from L1, dropping the entry if it has expired"""
+        entry = self._l1.get(key)
+        if entry is None:
+            return None
+
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._l1[key]
+            return None
+
+        self._l1.move_to_end(key)
+        return value
+
+    def _l1_set(self, key: str, value: str, ttl: int):
+        """Put into L1, evicting the least recently used entry when full"""
+        if value == CACHE_MISS_SENTINEL:
+            return
+        self._l1[key] = (value, time.monotonic() + min(ttl, self.l1_ttl))
+        self._l1.move_to_end(key)
+        if len(self._l1) > self.l1_max_size:
+            self._l1.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[str]:
+        """Get value from L1, falling back to L2"""
+        value = self._l1_get(key)
+        if value is not None:
+            return value
+
+        value = await self.l2.get(key)
+        if value is not None:
+            self._l1_set(key, value, self.l1_ttl)
+        return value
+
+    async def mget(self, keys: List[str]) -> List[Optional[str]]:
+        """Get multiple values; only L1 misses are fetched from L2"""
+        values = [self._l1_get(key) for key in keys]
+
+        missing = [i for i, value in enumerate(values) if value is None]
+        if missing:
+            l2_values = await self.l2.mget([keys[i] for i in missing])
+            for i, value in zip(missing, l2_values):
+                if value is not None:
+                    self._l1_set(keys[i], value, self.l1_ttl)
+                values[i] = value
+
+        return values
+
+    async def set(self, key: str, value: str, ttl: int = 3600) -> bool:
+        """Set value in both levels (write-through)"""
+        self._l1_set(key, value, ttl)
+        return await self.l2.set(key, value, ttl)
+
+    async def mset(self, items: Dict[str, str], ttl: int = 3600) -> bool:
+        """Set values in both levels (write-through, one L2 call)"""
+        for key, value in items.items():
+            self._l1_set(key, value, ttl)
+        return await self.l2.mset(items, ttl)
+
+    async def delete(self, key: str) -> bool:
+        """Delete key from both levels"""
+        self._l1.pop(key, None)
+        return await self.l2.delete(key)
+
+    async def exists(self, key: str) -> bool:
+        """Check L1, then L2"""
+        if self._l1_get(key) is not None:
+            return True
+        return await self.l2.exists(key)
+
+    async def clear(self) -> bool:
+        """Clear both levels"""
+        self._l1.clear()
+        return await self.l2.clear()
+
+    async def warm_up(self, connections: int):
+        """Warm up the L2 cache connections"""
+        await self.l2.warm_up(connections)
+
+    async def close(self):
+        """Close the L2 cache"""
+        await self.l2.close()
@@ -28,33 +28,54 @@ class Settings(BaseSettings):
     
     # Database
     database_url: str = "sqlite:///./url_shortener.db"
+    db_pool_size: int = 20  # Persistent connections per engine (ignored for SQLite)
+    db_max_overflow: int = 20  # Extra connections allowed under bursts
+    db_pool_timeout: int = 30  # Seconds to wait for a free connection
+    db_pool_recycle: int = 3600  # Recycle connections older than this (seconds)
     
     # URL Shortener specific
     base_url: str = "http://127.0.0.1:8000"
     short_url_length: int = 5  # Max 5 characters for short codes
     max_retries: int = 5
+    # Redirects: 301 + Cache-Control lets browsers/CDNs serve repeat clicks
+    # without reaching us (repeat clicks then don't show up in hit analytics)
+    permanent_redirects: bool = False  # 301 instead of 302
+    redirect_cache_max_age: int = 86400  # Cache-Control max-age for 301 redirects (seconds)
     
     # Short code generation strategy
-    short_code_strategy: str = "base62"  # Options: "random", "base62"
-    short_code_salt: int = 1256  # Salt for Base62 strategy (4 digits)
+    short_code_strategy: str = "base62"  # Options: "random", "base62", "base64url"
+    short_code_salt: int = 1256  # Salt for Base62/Base64-url strategies (4 digits)
     
     # Cache settings
     cache_backend: str = "redis"  # Options: "redis", "memory", "null"
     redis_url: str = "redis://localhost:6379/0"
+    redis_pool_size: int = 50  # Max connections in the Redis connection pool
     cache_ttl: int = 3600  # Cache TTL in seconds (1 hour)
+    cache_negative_ttl: int = 5  # TTL in seconds for cached "not found" lookups (keep short: bounds 404s for newly created codes)
+    cache_l1_max_size: int = 10000  # In-process LRU entries in front of Redis (0 = disabled)
+    cache_l1_ttl: int = 60  # In-process LRU entry lifetime in seconds
     
     # Queue settings
     queue_backend: str = "redis_streams"  # Options: "redis_streams", "memory"
     queue_name: str = "url_hits"
     queue_consumer_group: str = "url_workers"
-    queue_batch_size: int = 1  # Number of messages to process at once
-    queue_worker_interval: int = 5  # Worker poll interval in seconds
+    queue_claim_min_idle_ms: int = 30000  # Reclaim unacked messages idle this long (crashed workers)
+    queue_max_stream_length: int = 1000000  # Approximate stream cap via XADD MAXLEN ~ (0 = unbounded)
+    queue_batch_size: int = 500  # Number of messages the worker reads per XREADGROUP
+    hit_flush_interval_seconds: float = 0.5  # Worker flushes total_hits at least this often
+    hit_flush_max_urls: int = 1000  # ...or as soon as this many distinct URLs have pending hits
+    worker_log_level: str = "INFO"  # Hit worker log level (DEBUG logs every batch)
+    queue_publish_batch_size: int = 100  # Max hit events per publish round-trip
+    queue_buffer_size: int = 10000  # Max hit events buffered in-process before publishing
     
     # Hit Storage settings (Analytics Database)
     hit_storage_backend: str = "sqlite"  # Options: "sqlite", "clickhouse"
     hit_storage_sqlite_path: str = "analytics.db"  # SQLite database path
     hit_storage_clickhouse_url: str = "http://localhost:8123"  # ClickHouse HTTP endpoint
     hit_storage_buffer_size: int = 1  # Buffer size for batching (ClickHouse)
+    hit_storage_flush_interval: float = 0.2  # Max seconds a buffered hit waits before insert (ClickHouse)
+    hit_storage_read_cache_ttl: float = 5.0  # Seconds analytics reads are cached in process (0 = off)
+    hit_storage_read_cache_max_size: int = 4096  # Max short codes with cached analytics reads
     
     # Rate limiting
     rate_limit_per_minute: int = 60
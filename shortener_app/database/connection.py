@@ -1,24 +1,111 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, declarative_base
 from shortener_app.config import settings
 
-# Create database engine
+# Async drivers for the sync database URLs used in settings, by backend
+# (any sync driver suffix, e.g. postgresql+psycopg2://, maps to the same one)
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+# URLs that already name an async driver are used as-is
+ASYNC_DRIVER_NAMES = {"aiosqlite", "asyncpg", "aiomysql", "asyncmy", "psycopg"}
+
+
+def get_async_database_url(database_url: str):
+    """
+    Convert a sync database URL (e.g. sqlite://) to its async driver variant.
+    
+    Raises:
+        ValueError: If the database backend has no supported async driver
+    """
+    url = make_url(database_url)
+    if url.get_driver_name() in ASYNC_DRIVER_NAMES:
+        return url
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(
+            f"Unsupported DATABASE_URL scheme '{url.drivername}': "
+            f"supported backends are {', '.join(ASYNC_DRIVERS)}"
+        )
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+is_sqlite = settings.database_url.startswith("sqlite")
+is_postgres = settings.database_url.startswith("postgresql")
+
+# Connection pool tuning (server databases only - see async_engine note below)
+# Defaults (5 + 10 overflow) run out under bursts of concurrent requests
+POOL_OPTIONS = {} if is_sqlite else {
+    "pool_size": settings.db_pool_size,
+    "max_overflow": settings.db_max_overflow,
+    "pool_timeout": settings.db_pool_timeout,
+}
+
+# Create database engine (sync)
+# Used by the hit worker and Alembic - never on the API event loop
 engine = create_engine(
     settings.database_url,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {}
+    pool_pre_ping=True,
+    pool_recycle=settings.db_pool_recycle,
+    connect_args=(
+        {"check_same_thread": False} if is_sqlite
+        else {"application_name": "url_shortener"} if is_postgres  # Visible in pg_stat_activity
+        else {}
+    ),
+    **POOL_OPTIONS
 )
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Create async database engine
+# Used by API request handlers: DB queries are awaited instead of blocking the event loop
+# (SQLite file databases use NullPool with aiosqlite, so pool sizing only applies to servers)
+async_engine = create_async_engine(
+    get_async_database_url(settings.database_url),
+    pool_pre_ping=True,
+    pool_recycle=settings.db_pool_recycle,
+    connect_args={"server_settings": {"application_name": "url_shortener"}} if is_postgres else {},
+    **POOL_OPTIONS
+)
+
+# Create AsyncSessionLocal class
+# expire_on_commit=False: returned models stay readable after commit (no lazy reload I/O)
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+# SQLite tuning applied to every new connection:
+# - WAL: readers don't block on the writer (redirect reads vs URL creates)
+# - synchronous=NORMAL: safe with WAL, far fewer fsyncs
+# - temp_store/cache_size: temp tables in memory, ~64MB page cache
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",
+)
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Apply SQLITE_PRAGMAS on connect (works for sqlite3 and aiosqlite)"""
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+
+if is_sqlite:
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+
 # Create Base class for models (SQLAlchemy 2.0 style)
 Base = declarative_base()
 
 
-def get_db():
-    """Dependency to get database session"""
-    db = SessionLocal()
-    try:
+async def get_db():
+    """Dependency to get async database session"""
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
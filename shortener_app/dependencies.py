@@ -2,7 +2,8 @@
 FastAPI dependencies for dependency injection.
 
 This module provides singleton instances of cache, queue, and hit storage
-that are injected into services and routes.
+that are injected into services and routes. Cache, queue and hit buffer are
+created once in the app lifespan (main.py) and read from app.state.
 
 Pattern: Dependency Injection
 - Loose coupling between components
@@ -10,58 +11,63 @@ Pattern: Dependency Injection
 - Flexible (swap implementations via config)
 """
 
-from functools import lru_cache
+from fastapi import Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from fastapi import Depends
-from sqlalchemy.orm import Session
-
-from shortener_app.cache.factory import CacheFactory, CacheBackend
 from shortener_app.database.connection import get_db
-from shortener_app.queue.factory import QueueFactory, QueueBackend
 from shortener_app.storage.factory import HitStorageFactory, HitStorageBackend
 from shortener_app.cache.strategies import CacheStrategy
 from shortener_app.queue.strategies import QueueStrategy
+from shortener_app.queue.buffer import HitEventBuffer
 from shortener_app.storage.strategies import HitStorageStrategy
+from shortener_app.services.url_service import URLService
 from shortener_app.config import settings
 
 
-@lru_cache()
-def get_cache() -> CacheStrategy:
+def get_cache(request: Request) -> CacheStrategy:
     """
     Get cache instance (singleton).
     
-    Factory gets config from settings internally.
-    @lru_cache ensures this is called only once.
+    Created once by CacheFactory in the app lifespan and stored
+    on app.state, so this is just an attribute read per request.
     
     Returns:
         CacheStrategy instance based on settings
     """
-    backend = CacheBackend(settings.cache_backend)
-    return CacheFactory.create(backend)
+    return request.app.state.cache
 
 
-@lru_cache()
-def get_queue() -> QueueStrategy:
+def get_queue(request: Request) -> QueueStrategy:
     """
     Get queue instance (singleton).
     
-    Factory gets config from settings internally.
-    @lru_cache ensures this is called only once.
+    Created once by QueueFactory in the app lifespan and stored on app.state.
     
     Returns:
         QueueStrategy instance based on settings
     """
-    backend = QueueBackend(settings.queue_backend)
-    return QueueFactory.create(backend)
+    return request.app.state.queue
+
+
+def get_hit_buffer(request: Request) -> HitEventBuffer:
+    """
+    Get hit event buffer (singleton).
+    
+    Wraps the queue so redirects enqueue hits in memory and a background
+    task publishes them in batches. Started/stopped in the app lifespan.
+    
+    Returns:
+        HitEventBuffer publishing to the configured queue
+    """
+    return request.app.state.hit_buffer
 
 
-@lru_cache()
 def get_hit_storage() -> HitStorageStrategy:
     """
     Get hit storage instance (singleton).
     
-    Factory gets config from settings internally.
-    @lru_cache ensures this is called only once.
+    Not used by the API (only the hit worker writes/reads analytics),
+    so it is created lazily; the factory caches the instance.
     
     Returns:
         HitStorageStrategy instance based on settings
@@ -71,10 +77,10 @@ def get_hit_storage() -> HitStorageStrategy:
 
 
 def get_url_service(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     cache: CacheStrategy = Depends(get_cache),
     queue: QueueStrategy = Depends(get_queue)
-):
+) -> URLService:
     """
     Get URLService with all dependencies injected.
     
@@ -87,6 +93,5 @@ def get_url_service(
     - Easier to test (mock service, not individual deps)
     - Better separation of concerns
     """
-    from shortener_app.services.url_service import URLService
     return URLService(db=db, cache=cache, queue=queue)
 
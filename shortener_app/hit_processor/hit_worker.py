@@ -12,12 +12,18 @@ Architecture:
 """
 
 import asyncio
+import csv
+import io
+import logging
+import logging.handlers
+import queue as stdlib_queue
 import signal
 import sys
-from typing import Dict, List
-from datetime import datetime, timezone
-from sqlalchemy import update
-from sqlalchemy.orm import Session
+import time
+from collections import Counter, OrderedDict
+from typing import List
+from sqlalchemy import update, select, case
+from sqlalchemy.orm import Session, scoped_session
 from shortener_app.database.connection import SessionLocal
 from shortener_app.models.url import URL
 from shortener_app.queue.strategies import QueueStrategy
@@ -25,6 +31,14 @@ from shortener_app.queue.models import HitEvent
 from shortener_app.storage.strategies import HitStorageStrategy
 from shortener_app.config import settings
 
+logger = logging.getLogger(__name__)
+
+# Flushes touching at least this many URLs use COPY + UPDATE ... FROM on PostgreSQL
+COPY_MIN_URLS = 50
+
+# Message IDs remembered to skip redelivered hits (e.g. a batch processed but not acked)
+SEEN_IDS_MAX = 100_000
+
 
 class SimpleHitWorker:
     """
@@ -54,35 +68,61 @@ class SimpleHitWorker:
         self.queue = queue
         self.storage = storage
         self.db_session_factory = db_session_factory
+        # One long-lived session reused by every flush (commit returns the
+        # connection to the pool; the session itself is not rebuilt each time)
+        self.db = scoped_session(db_session_factory)
         self.running = False
-        self.hit_counts: Dict[str, int] = {}  # In-memory counter
+        self.hit_counts: Counter = Counter()  # In-memory counter (short_code -> hits)
+        self._seen_ids: "OrderedDict[str, None]" = OrderedDict()  # Recently processed message IDs (LRU)
         self.processed_count = 0
 
         # Configuration from settings
-        self.batch_size = getattr(settings, 'queue_batch_size', 1)
-        self.update_interval = 1  # Update total_hits every 30 seconds
-        self.update_total_hits_url_limit = 1  # Update when this many URLs accumulated
-        self.last_update = datetime.now(timezone.utc)
+        # Large batches: one XREADGROUP / storage write / UPDATE per up to batch_size hits
+        self.batch_size = settings.queue_batch_size
+        self.update_interval = settings.hit_flush_interval_seconds  # Update total_hits every N seconds (float)
+        self.update_total_hits_url_limit = settings.hit_flush_max_urls  # Update when this many URLs accumulated
+        # Back-pressure: stop consuming while this many URLs are pending (e.g. DB down)
+        self.max_pending_urls = settings.hit_flush_max_urls * 10
+        self.last_update = time.monotonic()  # Monotonic: immune to wall-clock jumps, no allocation
 
     async def start(self):
         """Start the worker process"""
         self.running = True
-        print("🚀 Simple Hit Worker started")
-        print(f"📊 Batch size: {self.batch_size}")
-        print(f"⏰ Update interval: {self.update_interval}s")
+        logger.info("Simple Hit Worker started")
+        logger.info("Batch size: %d", self.batch_size)
+        logger.info("Update interval: %ss", self.update_interval)
         
         # Setup signal handlers
         signal.signal(signal.SIGINT, self._signal_handler)
         signal.signal(signal.SIGTERM, self._signal_handler)
         
+        # IDs of the last successful batch: acked together with the next read
+        # (one Redis round-trip instead of a separate XACK). Kept until an
+        # ack succeeds - consume_and_ack raises if it couldn't ack them.
+        ack_ids: List[str] = []
+        
         while self.running:
             try:
-                # Get batch of messages
-                messages = await self.queue.consume_batch(
+                # Back-pressure: don't consume more while flushes keep failing
+                if len(self.hit_counts) >= self.max_pending_urls:
+                    # Ack what was already processed, so it isn't left pending
+                    # (and reclaimed by another worker) while the DB is down
+                    if ack_ids and await self.queue.ack(settings.queue_name, ack_ids):
+                        ack_ids = []
+                    try:
+                        await self._update_total_hits()
+                    except Exception:
+                        await asyncio.sleep(1)
+                    continue
+                
+                # Ack previous batch + get next batch of messages
+                messages = await self.queue.consume_and_ack(
                     queue_name=settings.queue_name,
+                    ack_ids=ack_ids,
                     batch_size=self.batch_size,
                     block_time=1000  # 1 second
                 )
+                ack_ids = []
                 
                 if messages:
                     try:
@@ -92,29 +132,31 @@ class SimpleHitWorker:
                         # Step 2: Update total_hits if needed
                         await self._update_total_hits_if_needed()
                         
-                        # Step 3: ONLY acknowledge if everything succeeded
-                        message_ids = [msg.message_id for msg in messages if hasattr(msg, 'message_id')]
-                        if message_ids:
-                            await self.queue.ack(settings.queue_name, message_ids)
+                        # Step 3: ONLY acknowledge if everything succeeded (on the next read)
+                        ack_ids = [msg.message_id for msg in messages if msg.message_id]
                         
                         self.processed_count += len(messages)
-                        print(f"✅ Processed {len(messages)} hits. Total: {self.processed_count}")
+                        logger.debug("Processed %d hits. Total: %d", len(messages), self.processed_count)
                         
                     except Exception as e:
-                        print(f"❌ Batch processing failed: {e}")
+                        logger.error("Batch processing failed: %s", e)
                         # Messages stay in queue for retry!
                         # Don't acknowledge failed messages
                 
             except asyncio.CancelledError:
-                print("⚠️  Worker task cancelled.")
+                logger.warning("Worker task cancelled")
                 break
             except Exception as e:
-                print(f"❌ Error in main loop: {e}")
+                logger.error("Error in main loop: %s", e)
                 await asyncio.sleep(1)
         
+        # Acknowledge the last processed batch (no next read to piggyback on)
+        if ack_ids:
+            await self.queue.ack(settings.queue_name, ack_ids)
+        
         # Graceful shutdown: flush pending hits
         await self._graceful_shutdown()
-        print("🛑 Simple Hit Worker stopped")
+        logger.info("Simple Hit Worker stopped")
     
     async def _process_batch(self, messages: List[HitEvent]):
         """
@@ -122,26 +164,44 @@ class SimpleHitWorker:
         
         Steps:
         1. Store analytics data (batch write)
-        2. Count hits in memory
+        2. Count hits per short code
+        3. Merge the counts only once the write succeeded
+        
+        Raises if storage fails, so start() skips the ack and the
+        messages stay pending for retry (and aren't counted twice).
         """
+        # Skip redelivered messages already counted (batch processed, but
+        # flush/ack failed) so total_hits isn't incremented twice
+        messages = [hit for hit in messages if hit.message_id not in self._seen_ids]
+        if not messages:
+            return
+        
         # Step 1: Store analytics data (batch write to SQLite/ClickHouse)
-        try:
-            await self.storage.store_hits(messages)
-        except Exception as e:
-            print(f"❌ Storage error: {e}")
-            # Continue processing even if storage fails
+        if not await self.storage.store_hits(messages):
+            raise RuntimeError(f"Storage failed for batch of {len(messages)} hits")
+        
+        # Step 2: Count hits in memory (Counter counts in C)
+        batch_counts = Counter(hit.short_code for hit in messages)
         
-        # Step 2: Count hits in memory
+        # Step 3: Add to pending total_hits
+        self.hit_counts.update(batch_counts)
+        self._mark_seen(messages)
+    
+    def _mark_seen(self, messages: List[HitEvent]):
+        """Remember message IDs, evicting the oldest beyond SEEN_IDS_MAX"""
         for hit in messages:
-            self.hit_counts[hit.short_code] = self.hit_counts.get(hit.short_code, 0) + 1
+            if hit.message_id:
+                self._seen_ids[hit.message_id] = None
+        while len(self._seen_ids) > SEEN_IDS_MAX:
+            self._seen_ids.popitem(last=False)
     
     async def _update_total_hits_if_needed(self):
         """Update total_hits in main DB if needed"""
-        now = datetime.now(timezone.utc)
+        elapsed = time.monotonic() - self.last_update
         
         # Update if enough time has passed or too many hits accumulated
         should_update = (
-            (now - self.last_update).seconds >= self.update_interval or
+            elapsed >= self.update_interval or
             len(self.hit_counts) >= self.update_total_hits_url_limit
         )
         
@@ -153,58 +213,101 @@ class SimpleHitWorker:
         if not self.hit_counts:
             return
         
-        db = self.db_session_factory()
-        updated_count = 0
+        db = self.db()
         
         try:
-            # Atomic batch update using SQL UPDATE
-            # This prevents race conditions - database handles the increment atomically
-            for short_code, count in self.hit_counts.items():
-                # Atomic UPDATE: total_hits = total_hits + count
-                # This is thread-safe and works with multiple workers
-                stmt = (
-                    update(URL)
-                    .where(URL.short_code == short_code)
-                    .values(total_hits=URL.total_hits + count)
-                )
-                
-                result = db.execute(stmt)
-                
-                if result.rowcount == 0:
-                    print(f"⚠️  URL not found: {short_code}")
-                else:
-                    updated_count += 1
+            if db.get_bind().dialect.name == "postgresql" and len(self.hit_counts) >= COPY_MIN_URLS:
+                updated_count = self._update_total_hits_via_copy(db)
+            else:
+                updated_count = self._update_total_hits_via_case(db)
+            
+            # Some codes had no row (e.g. deleted URL) - find which with one
+            # IN query (only on this rare path), for a single warning
+            if updated_count < len(self.hit_counts):
+                existing = set(db.scalars(
+                    select(URL.short_code).where(URL.short_code.in_(list(self.hit_counts)))
+                ))
+                missing = sorted(self.hit_counts.keys() - existing)
+                logger.warning("URLs not found (%d): %s", len(missing), ", ".join(missing))
             
             # Single commit for all updates
             db.commit()
             
             # Reset counter and update timestamp
             self.hit_counts.clear()
-            self.last_update = datetime.now(timezone.utc)
+            self.last_update = time.monotonic()
             
             if updated_count > 0:
-                print(f"📊 Updated total_hits for {updated_count} URLs")
+                logger.debug("Updated total_hits for %d URLs", updated_count)
             
         except Exception as e:
             db.rollback()
-            print(f"❌ Database error: {e}")
+            # Discard the session; the next flush starts from a fresh one
+            self.db.remove()
+            logger.error("Database error: %s", e)
             raise
-        finally:
-            db.close()
+    
+    def _update_total_hits_via_case(self, db: Session) -> int:
+        """
+        Single atomic bulk UPDATE for all short codes (one round-trip):
+        UPDATE urls SET total_hits = total_hits + CASE short_code WHEN :c THEN :n ... END
+        WHERE short_code IN (...)
+        
+        The database handles the increment atomically, so it is safe with multiple workers.
+        
+        Returns:
+            Number of updated rows
+        """
+        stmt = (
+            update(URL)
+            .where(URL.short_code.in_(list(self.hit_counts)))
+            .values(total_hits=URL.total_hits + case(self.hit_counts, value=URL.short_code))
+            .execution_options(synchronize_session=False)
+        )
+        return db.execute(stmt).rowcount
+    
+    def _update_total_hits_via_copy(self, db: Session) -> int:
+        """
+        PostgreSQL bulk path: COPY the deltas into a temp table, then one UPDATE ... FROM.
+        
+        COPY streams all rows without per-parameter binding, and the join keeps
+        the UPDATE statement the same size however many URLs are flushed.
+        Runs inside the session's transaction (temp table dropped on commit).
+        
+        Returns:
+            Number of updated rows
+        """
+        buffer = io.StringIO()
+        csv.writer(buffer, delimiter="\t", lineterminator="\n").writerows(self.hit_counts.items())
+        buffer.seek(0)
+        
+        # Raw psycopg2 connection of the session's current transaction
+        raw_connection = db.connection().connection
+        with raw_connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE TEMP TABLE tmp_hits (short_code text, delta integer) ON COMMIT DROP"
+            )
+            cursor.copy_from(buffer, "tmp_hits", sep="\t", columns=("short_code", "delta"))
+            cursor.execute(
+                "UPDATE urls SET total_hits = urls.total_hits + t.delta "
+                "FROM tmp_hits t WHERE urls.short_code = t.short_code"
+            )
+            return cursor.rowcount
     
     async def _graceful_shutdown(self):
         """Flush pending hits before shutdown"""
         if self.hit_counts:
-            print(f"🔄 Flushing {len(self.hit_counts)} pending hits...")
+            logger.info("Flushing pending hits for %d URLs...", len(self.hit_counts))
             try:
                 await self._update_total_hits()
-                print("✅ All hits flushed successfully")
+                logger.info("All hits flushed successfully")
             except Exception as e:
-                print(f"⚠️  Failed to flush hits: {e}")
+                logger.warning("Failed to flush hits: %s", e)
+        self.db.remove()
     
     def _signal_handler(self, signum, frame):
         """Handle signals for graceful shutdown"""
-        print(f"\nReceived signal {signum}. Shutting down gracefully...")
+        logger.info("Received signal %s. Shutting down gracefully...", signum)
         self.stop()
     
     def stop(self):
@@ -212,6 +315,28 @@ class SimpleHitWorker:
         self.running = False
 
 
+def setup_logging() -> logging.handlers.QueueListener:
+    """
+    Configure worker logging with the formatting/writing off the consume loop.
+    
+    Log calls only put records on an in-memory queue (QueueHandler); a
+    QueueListener thread writes them to stderr. Caller must stop() the
+    returned listener on exit to flush pending records.
+    """
+    log_queue = stdlib_queue.SimpleQueue()
+    
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    
+    root = logging.getLogger()
+    root.setLevel(settings.worker_log_level.upper())
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    
+    listener.start()
+    return listener
+
+
 async def main():
     """
     Main entry point for simple hit worker.
@@ -227,15 +352,18 @@ async def main():
     print(f"Storage backend: {settings.hit_storage_backend}")
     print("=" * 60)
     
+    log_listener = setup_logging()
+    
     # Create queue instance
     from shortener_app.queue.factory import QueueFactory, QueueBackend
     queue_backend = QueueBackend(settings.queue_backend)
-    queue = QueueFactory.create(queue_backend)
+    queue = await QueueFactory.create(queue_backend)
     
     # Create storage instance
     from shortener_app.storage.factory import HitStorageFactory, HitStorageBackend
     storage_backend = HitStorageBackend(settings.hit_storage_backend)
     storage = HitStorageFactory.create(storage_backend)
+    await storage.warm_up()  # Create the analytics schema before the first batch
     
     # Create and start worker
     worker = SimpleHitWorker(queue=queue, storage=storage)
@@ -247,6 +375,9 @@ async def main():
     except Exception as e:
         print(f"❌ Fatal error: {e}")
         sys.exit(1)
+    finally:
+        await storage.close()
+        log_listener.stop()
 
 
 if __name__ == "__main__":
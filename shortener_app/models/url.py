@@ -16,11 +16,12 @@ class URL(Base):
     """
     __tablename__ = "urls"
 
-    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    # No index=True: the primary key is already indexed (a second B-tree only costs writes)
+    id = Column(Integer, primary_key=True, autoincrement=True)
     long_url = Column(String, nullable=False)
     # Note: unique=True automatically creates an index in SQLAlchemy (like Django)
     # Setting max length to 5 characters for short codes
-    # Nullable=True allows two-step creation: first get ID, then generate short_code
+    # Nullable=True is historical (two-step creation); rows are now inserted with their code
     short_code = Column(String(5), unique=True, nullable=True, index=True)
     total_hits = Column(Integer, default=0)  # Aggregate count for quick stats
     is_active = Column(Boolean, default=True)
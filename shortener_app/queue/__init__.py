@@ -6,6 +6,7 @@ Implements Strategy Pattern for flexible queue backends.
 from .strategies import QueueStrategy, RedisStreamQueue, InMemoryQueue
 from .factory import QueueFactory
 from .models import HitEvent
+from .buffer import HitEventBuffer
 
 __all__ = [
     "QueueStrategy",
@@ -13,5 +14,6 @@ __all__ = [
     "InMemoryQueue",
     "QueueFactory",
     "HitEvent",
+    "HitEventBuffer",
 ]
 
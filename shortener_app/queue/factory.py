@@ -3,6 +3,7 @@ Factory for creating queue instances.
 Simple, clean factory with singleton caching.
 """
 
+import asyncio
 from enum import Enum
 from .strategies import QueueStrategy, RedisStreamQueue, InMemoryQueue
 from shortener_app.config import settings
@@ -19,15 +20,22 @@ class QueueFactory:
     Simple factory for creating queue instances.
     
     Gets configuration from settings (not passed as parameters).
+    
+    Creation is guarded by an asyncio.Lock so concurrent callers
+    can't open (and PING) two Redis clients at once.
     """
     
     _instance: QueueStrategy = None  # Single cached instance
+    _lock = asyncio.Lock()
     
     @classmethod
-    def create(cls, backend: QueueBackend) -> QueueStrategy:
+    async def create(cls, backend: QueueBackend) -> QueueStrategy:
         """
         Create or return cached queue instance.
         
+        Async because the Redis client is async (redis.asyncio) and the
+        connection test (PING) must be awaited.
+        
         Args:
             backend: Type of queue backend (from enum)
             
@@ -38,42 +46,58 @@ class QueueFactory:
         if cls._instance is not None:
             return cls._instance
         
-        # Create new instance based on backend type
+        async with cls._lock:
+            # Another caller may have created it while we waited
+            if cls._instance is None:
+                cls._instance = await cls._build(backend)
+        
+        return cls._instance
+    
+    @classmethod
+    async def _build(cls, backend: QueueBackend) -> QueueStrategy:
+        """Create new instance based on backend type"""
         if backend == QueueBackend.REDIS_STREAMS:
-            import redis
+            from redis.asyncio import from_url
             
             try:
                 # Get config from settings
-                redis_client = redis.from_url(
+                # Async client: XREADGROUP BLOCK yields to the event loop instead of freezing it
+                redis_client = from_url(
                     settings.redis_url,
                     decode_responses=False,
                     socket_connect_timeout=2,  # Reduced timeout
-                    socket_timeout=2,          # Reduced timeout
+                    # Half-open connections fail instead of hanging publish/XREADGROUP;
+                    # must stay above the worker's XREADGROUP BLOCK time (1s)
+                    socket_timeout=5,
                 )
                 
                 # Test connection immediately
-                redis_client.ping()
+                await redis_client.ping()
                 
-                cls._instance = RedisStreamQueue(
+                queue = RedisStreamQueue(
                     redis_client,
-                    settings.queue_consumer_group
+                    settings.queue_consumer_group,
+                    claim_min_idle_ms=settings.queue_claim_min_idle_ms,
+                    max_stream_length=settings.queue_max_stream_length or None
                 )
+                # Create stream + consumer group once here, not on every publish/consume
+                await queue._ensure_stream_exists(settings.queue_name)
+                
                 print("✅ Redis queue initialized")
+                return queue
                 
             except Exception as e:
                 print(f"⚠️  Redis connection failed: {e}")
                 print(f"⚠️  Falling back to in-memory queue")
-                cls._instance = InMemoryQueue()
                 print("✅ In-memory queue initialized (fallback)")
+                return InMemoryQueue()
             
         elif backend == QueueBackend.MEMORY:
-            cls._instance = InMemoryQueue()
             print("✅ In-memory queue initialized")
+            return InMemoryQueue()
             
         else:
             raise ValueError(f"Unknown queue backend: {backend}")
-        
-        return cls._instance
     
     @classmethod
     def clear_instance(cls):
@@ -2,48 +2,85 @@
 Data models for queue messages.
 """
 
-from pydantic import BaseModel, Field, ConfigDict
+from dataclasses import dataclass, field, fields
 from datetime import datetime, timezone
-from typing import Optional
+from typing import Any, Dict, Optional
 
+import orjson
 
-class HitEvent(BaseModel):
+
+@dataclass(slots=True)
+class HitEvent:
     """
     Event model for URL hit tracking.
-    
+
     This is published to the queue when a user accesses a short URL.
     Contains all metadata needed for analytics.
+
+    A slotted dataclass (not a Pydantic model): one is built per redirect,
+    and the data is produced by our own code, so there is nothing to validate.
+
+    Example:
+        HitEvent(
+            short_code="abc12",
+            ip_address="192.168.1.1",
+            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/120.0",
+            referer="https://twitter.com",
+        )
     """
-    
-    short_code: str = Field(..., description="The short code that was accessed")
-    timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), description="When the hit occurred")
-    
+
+    short_code: str  # The short code that was accessed
+    timestamp: datetime = field(default_factory=lambda: datetime.now(timezone.utc))  # When the hit occurred
+
     # Request metadata
-    ip_address: Optional[str] = Field(None, description="Client IP address")
-    user_agent: Optional[str] = Field(None, description="User agent string")
-    referer: Optional[str] = Field(None, description="HTTP referer")
-    
+    ip_address: Optional[str] = None  # Client IP address
+    user_agent: Optional[str] = None  # User agent string
+    referer: Optional[str] = None  # HTTP referer
+
     # Parsed metadata (can be enriched by worker)
-    country: Optional[str] = Field(None, description="Country code (e.g., US, UK)")
-    device_type: Optional[str] = Field(None, description="Device type (mobile, desktop, tablet)")
-    browser: Optional[str] = Field(None, description="Browser name")
-    
-    # Queue metadata (set by queue consumer)
-    message_id: Optional[str] = Field(None, description="Queue message ID (for acknowledgment)")
-    
-    # Pydantic V2 style configuration
-    model_config = ConfigDict(
-        json_schema_extra={
-            "example": {
-                "short_code": "abc12",
-                "timestamp": "2025-10-29T10:30:00",
-                "ip_address": "192.168.1.1",
-                "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/120.0",
-                "referer": "https://twitter.com",
-                "country": "US",
-                "device_type": "desktop",
-                "browser": "Chrome"
-            }
+    country: Optional[str] = None  # Country code (e.g., US, UK)
+    device_type: Optional[str] = None  # Device type (mobile, desktop, tablet)
+    browser: Optional[str] = None  # Browser name
+
+    # Queue metadata (set by queue consumer, not serialized)
+    message_id: Optional[str] = None  # Queue message ID (for acknowledgment)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dict for serialization (excludes queue metadata)"""
+        return {
+            name: getattr(self, name)
+            for name in _SERIALIZED_FIELDS
         }
-    )
 
+    def to_json(self) -> bytes:
+        """Serialize to JSON bytes (orjson handles datetime natively)"""
+        return orjson.dumps(self.to_dict())
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], message_id: Optional[str] = None) -> "HitEvent":
+        """
+        Build from a deserialized dict (timestamp as ISO 8601 string).
+        
+        No validation: data comes from our own to_json(). The timestamp is
+        parsed in place on the new instance (no copy of the dict unless it
+        has unknown keys).
+        
+        Payloads written by the old Pydantic model also carry
+        "message_id": null; it is dropped, as are any other keys that are
+        not event fields, so messages left in the stream still parse.
+        
+        Args:
+            data: Dict produced by orjson.loads(to_json())
+            message_id: Queue message ID (set by the consumer)
+        """
+        data.pop("message_id", None)
+        if not _FIELD_NAMES.issuperset(data):
+            data = {name: value for name, value in data.items() if name in _FIELD_NAMES}
+        event = cls(**data, message_id=message_id)
+        if isinstance(event.timestamp, str):
+            event.timestamp = datetime.fromisoformat(event.timestamp)
+        return event
+
+
+_SERIALIZED_FIELDS = tuple(f.name for f in fields(HitEvent) if f.name != "message_id")
+_FIELD_NAMES = frozenset(_SERIALIZED_FIELDS)
@@ -5,12 +5,19 @@ Allows switching between different queue backends (Redis Streams, In-Memory).
 
 from abc import ABC, abstractmethod
 from typing import List, Optional, Dict, Any
-import json
+import orjson
 from datetime import datetime
-from collections import deque
 import asyncio
 from .models import HitEvent
 
+# Stream entry field holding the orjson-encoded HitEvent.
+# Bytes on both sides: no str encode on XADD, direct lookup on XREADGROUP replies.
+STREAM_DATA_FIELD = b'data'
+
+# Entries that can't be parsed are copied to <queue_name><suffix> and acked,
+# so XAUTOCLAIM doesn't reclaim them forever
+DEAD_LETTER_SUFFIX = ':dead'
+
 
 class QueueStrategy(ABC):
     """
@@ -83,6 +90,53 @@ class QueueStrategy(ABC):
         """
         pass
     
+    async def publish_batch(self, queue_name: str, messages: List[HitEvent]) -> bool:
+        """
+        Publish multiple messages to the queue.
+        
+        Default implementation publishes one by one; backends that support
+        pipelining override this to publish in a single round-trip.
+        
+        Args:
+            queue_name: Name of the queue
+            messages: HitEvents to publish
+            
+        Returns:
+            True if all messages were published
+        """
+        results = [await self.publish(queue_name, message) for message in messages]
+        return all(results)
+    
+    async def consume_and_ack(
+        self,
+        queue_name: str,
+        ack_ids: List[str],
+        batch_size: int = 100,
+        block_time: int = 1000
+    ) -> List[HitEvent]:
+        """
+        Acknowledge the previous batch and consume the next one.
+        
+        Default implementation is ack() followed by consume(); backends that
+        support pipelining override this to save a round-trip.
+        
+        Args:
+            queue_name: Name of the queue
+            ack_ids: Message IDs of the previously processed batch (may be empty)
+            batch_size: Number of messages to consume
+            block_time: Time to wait for messages (milliseconds)
+            
+        Returns:
+            List of HitEvent messages
+            
+        Raises:
+            RuntimeError: ack_ids could not be acknowledged; the caller
+                keeps them and passes them again on the next call
+        """
+        if ack_ids and not await self.ack(queue_name, ack_ids):
+            raise RuntimeError(f"Failed to acknowledge {len(ack_ids)} messages")
+        return await self.consume(queue_name, batch_size, block_time)
+    
     async def consume_batch(self, queue_name: str, batch_size: int = 100, block_time: int = 1000) -> List[HitEvent]:
         """
         Consume a batch of messages (alias for consume with larger default batch size).
@@ -96,6 +150,20 @@ class QueueStrategy(ABC):
             List of HitEvent messages
         """
         return await self.consume(queue_name, batch_size, block_time)
+    
+    async def warm_up(self, connections: int):
+        """
+        Open connections ahead of traffic (called on app startup).
+        No-op by default (backends without a connection pool).
+        
+        Args:
+            connections: Number of pooled connections to open
+        """
+        pass
+    
+    async def close(self):
+        """Release connections (called on shutdown). No-op by default."""
+        pass
 
 
 class RedisStreamQueue(QueueStrategy):
@@ -112,27 +180,47 @@ class RedisStreamQueue(QueueStrategy):
     1. Producer publishes messages using XADD
     2. Consumer reads messages using XREADGROUP
     3. Consumer acknowledges messages using XACK
-    4. Unacknowledged messages can be reclaimed
+    4. Unacknowledged messages are reclaimed with XAUTOCLAIM (at-least-once)
+    5. XADD trims the stream to ~max_stream_length entries (MAXLEN ~), bounding
+       Redis memory. Trimming ignores acks: if workers fall that far behind,
+       the oldest unprocessed hits are dropped (acceptable for analytics).
+    6. Entries that fail to parse are copied to <stream>:dead and acked
+       (poison messages aren't reclaimed forever)
     
     Production-ready for high-volume URL shorteners.
     """
     
-    def __init__(self, redis_client, consumer_group: str = "url_workers"):
+    def __init__(
+        self,
+        redis_client,
+        consumer_group: str = "url_workers",
+        claim_min_idle_ms: int = 30000,
+        max_stream_length: Optional[int] = None
+    ):
         """
         Initialize Redis Streams queue.
         
         Args:
-            redis_client: Redis client instance
+            redis_client: Async Redis client instance (redis.asyncio.Redis)
             consumer_group: Name of consumer group for workers
+            claim_min_idle_ms: Unacked messages idle this long are reclaimed by consume()
+            max_stream_length: Approximate cap on stream entries (None = unbounded)
         """
         self.redis = redis_client
         self.consumer_group = consumer_group
+        self.claim_min_idle_ms = claim_min_idle_ms
+        self.max_stream_length = max_stream_length
+        self._claim_cursors: Dict[str, bytes] = {}  # XAUTOCLAIM cursor per stream
         self._initialized_streams = set()
     
     async def _ensure_stream_exists(self, queue_name: str):
         """
         Ensure stream and consumer group exist.
         Creates them if they don't exist.
+        
+        Called once by QueueFactory for settings.queue_name. Publishing
+        doesn't need it (XADD creates the stream); consume checks it only
+        for other queue names.
         """
         if queue_name in self._initialized_streams:
             return
@@ -140,7 +228,7 @@ class RedisStreamQueue(QueueStrategy):
         try:
             # Try to create consumer group
             # If stream doesn't exist, this creates it with MKSTREAM
-            self.redis.xgroup_create(
+            await self.redis.xgroup_create(
                 name=queue_name,
                 groupname=self.consumer_group,
                 id='0',
@@ -161,21 +249,58 @@ class RedisStreamQueue(QueueStrategy):
         Uses XADD command to append message to stream.
         """
         try:
-            await self._ensure_stream_exists(queue_name)
-            
-            # Convert HitEvent to dict and then to JSON
+            # Serialize HitEvent to JSON
             message_data = {
-                'data': message.model_dump_json()
+                STREAM_DATA_FIELD: message.to_json()
             }
             
-            # Add to stream (XADD command)
-            message_id = self.redis.xadd(queue_name, message_data)
+            # Add to stream (XADD command), trimming old entries (MAXLEN ~)
+            message_id = await self.redis.xadd(
+                queue_name,
+                message_data,
+                maxlen=self.max_stream_length,
+                approximate=True
+            )
             return True
             
         except Exception as e:
             print(f"❌ Redis publish error: {e}")
             return False
     
+    async def publish_batch(self, queue_name: str, messages: List[HitEvent]) -> bool:
+        """
+        Publish multiple messages to Redis Stream in one round-trip.
+        
+        Queues one XADD per message in a non-transactional pipeline. Entries
+        are applied independently, so only the XADDs that returned an error
+        are retried (once); re-sending the others would duplicate those hits.
+        """
+        try:
+            pending = messages
+            for _ in range(2):
+                pipe = self.redis.pipeline(transaction=False)
+                for message in pending:
+                    pipe.xadd(
+                        queue_name,
+                        {STREAM_DATA_FIELD: message.to_json()},
+                        maxlen=self.max_stream_length,
+                        approximate=True
+                    )
+                results = await pipe.execute(raise_on_error=False)
+                pending = [
+                    message for message, result in zip(pending, results)
+                    if isinstance(result, Exception)
+                ]
+                if not pending:
+                    return True
+            
+            print(f"❌ Redis publish error: {len(pending)} of {len(messages)} messages failed")
+            return False
+            
+        except Exception as e:
+            print(f"❌ Redis publish error: {e}")
+            return False
+    
     async def consume(
         self,
         queue_name: str,
@@ -185,49 +310,139 @@ class RedisStreamQueue(QueueStrategy):
         """
         Consume messages from Redis Stream.
         
-        Uses XREADGROUP to read messages for this consumer group.
-        Messages are not removed until acknowledged.
+        Uses XAUTOCLAIM (idle pending messages) and XREADGROUP (new messages)
+        for this consumer group. Messages are not removed until acknowledged.
+        """
+        return await self.consume_and_ack(queue_name, [], batch_size, block_time)
+    
+    async def consume_and_ack(
+        self,
+        queue_name: str,
+        ack_ids: List[str],
+        batch_size: int = 100,
+        block_time: int = 1000
+    ) -> List[HitEvent]:
+        """
+        Acknowledge the previous batch and consume the next one.
+        
+        XACK is pipelined with the XAUTOCLAIM that starts every read,
+        so acknowledging costs no extra round-trip. If anything fails while
+        ack_ids were given, the error is raised instead of returning [] -
+        the ack may not have happened, so the caller must keep the IDs
+        (XACK is idempotent, retrying an applied ack is harmless).
         """
         try:
-            await self._ensure_stream_exists(queue_name)
+            # Cold path only: the configured queue is set up by QueueFactory at startup
+            if queue_name not in self._initialized_streams:
+                await self._ensure_stream_exists(queue_name)
             
-            # Read from stream using consumer group
-            # '>' means "messages never delivered to other consumers"
             import socket
             consumer_name = f"worker-{socket.gethostname()}-{id(self)}"
             
-            messages = self.redis.xreadgroup(
-                groupname=self.consumer_group,
-                consumername=consumer_name,  # Dynamic consumer name per worker instance
-                streams={queue_name: '>'},
-                count=batch_size,
-                block=block_time
-            )
+            # Step 1: Ack the previous batch and reclaim messages delivered to a
+            # consumer that never acked them (crashed worker, failed batch)
+            # once they've been idle long enough - one pipelined round-trip
+            pipe = self.redis.pipeline(transaction=False)
+            if ack_ids:
+                pipe.xack(queue_name, self.consumer_group, *ack_ids)
+            self._autoclaim(pipe, queue_name, consumer_name, batch_size)
+            results = await pipe.execute()
+            entries = self._parse_autoclaim(queue_name, results[-1])
             
-            if not messages:
-                return []
+            # Step 2: Fill the rest of the batch with new messages
+            # '>' means "messages never delivered to other consumers"
+            if len(entries) < batch_size:
+                messages = await self.redis.xreadgroup(
+                    groupname=self.consumer_group,
+                    consumername=consumer_name,  # Dynamic consumer name per worker instance
+                    streams={queue_name: '>'},
+                    count=batch_size - len(entries),
+                    # Don't wait for new messages when reclaimed ones are ready
+                    block=None if entries else block_time
+                )
+                for stream_name, stream_messages in messages or []:
+                    entries.extend(stream_messages)
             
             # Parse messages
             events = []
-            for stream_name, stream_messages in messages:
-                for message_id, message_data in stream_messages:
-                    try:
-                        # Parse JSON data
-                        data = json.loads(message_data[b'data'].decode('utf-8'))
-                        event = HitEvent(**data)
-                        
-                        # Store message ID for acknowledgment
-                        event.message_id = message_id.decode('utf-8')
-                        events.append(event)
-                    except Exception as e:
-                        print(f"⚠️  Failed to parse message {message_id}: {e}")
+            dead = []
+            for message_id, message_data in entries:
+                try:
+                    # Parse JSON data (orjson reads bytes directly)
+                    # Store message ID for acknowledgment
+                    data = orjson.loads(message_data[STREAM_DATA_FIELD])
+                    events.append(HitEvent.from_dict(data, message_id=message_id.decode('utf-8')))
+                except Exception as e:
+                    print(f"⚠️  Failed to parse message {message_id}: {e}")
+                    dead.append((message_id, message_data, str(e)))
+            
+            if dead:
+                await self._dead_letter(queue_name, dead)
             
             return events
             
         except Exception as e:
             print(f"❌ Redis consume error: {e}")
+            if ack_ids:
+                raise
             return []
     
+    async def _dead_letter(self, queue_name: str, entries: list):
+        """
+        Move unparseable entries to the dead-letter stream and ack them.
+        
+        One pipelined round-trip: XADD of each raw entry (plus its original
+        ID and the parse error) to <queue_name>:dead, then XACK of all of
+        them. On failure the entries stay pending and are retried on a
+        later claim.
+        
+        Args:
+            queue_name: Stream the entries were read from
+            entries: (message_id, fields, error) tuples
+        """
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for message_id, message_data, error in entries:
+                pipe.xadd(
+                    queue_name + DEAD_LETTER_SUFFIX,
+                    {**message_data, b'message_id': message_id, b'error': error},
+                    maxlen=self.max_stream_length,
+                    approximate=True
+                )
+            pipe.xack(queue_name, self.consumer_group, *(entry[0] for entry in entries))
+            await pipe.execute()
+            print(f"⚠️  Dead-lettered {len(entries)} message(s) to {queue_name}{DEAD_LETTER_SUFFIX}")
+        except Exception as e:
+            print(f"❌ Redis dead-letter error: {e}")
+    
+    def _autoclaim(self, pipe, queue_name: str, consumer_name: str, count: int):
+        """
+        Queue an XAUTOCLAIM on the pipeline for messages idle at least claim_min_idle_ms.
+        
+        Scans the pending list incrementally: the cursor returned by Redis is
+        kept per stream, so each call continues where the previous one stopped.
+        """
+        pipe.xautoclaim(
+            queue_name,
+            self.consumer_group,
+            consumer_name,
+            min_idle_time=self.claim_min_idle_ms,
+            start_id=self._claim_cursors.get(queue_name, '0-0'),
+            count=count
+        )
+    
+    def _parse_autoclaim(self, queue_name: str, result) -> list:
+        """
+        Parse an XAUTOCLAIM reply and remember the scan cursor.
+        
+        Returns:
+            List of (message_id, fields) entries now owned by this consumer
+        """
+        # Reply: [next cursor, entries, (Redis 7+) deleted ids]
+        self._claim_cursors[queue_name] = result[0]
+        # Entries trimmed from the stream come back without fields (Redis < 7)
+        return [(message_id, fields) for message_id, fields in result[1] if fields]
+    
     async def ack(self, queue_name: str, message_ids: List[str]) -> bool:
         """
         Acknowledge messages (remove from pending list).
@@ -239,7 +454,7 @@ class RedisStreamQueue(QueueStrategy):
                 return True
             
             # Acknowledge messages
-            self.redis.xack(queue_name, self.consumer_group, *message_ids)
+            await self.redis.xack(queue_name, self.consumer_group, *message_ids)
             return True
             
         except Exception as e:
@@ -249,20 +464,32 @@ class RedisStreamQueue(QueueStrategy):
     async def get_queue_length(self, queue_name: str) -> int:
         """Get approximate queue length"""
         try:
-            info = self.redis.xinfo_stream(queue_name)
+            info = await self.redis.xinfo_stream(queue_name)
             return info['length']
         except Exception:
             return 0
+    
+    async def warm_up(self, connections: int):
+        """Open pooled connections up front with concurrent PINGs (the pool connects lazily)"""
+        try:
+            await asyncio.gather(*(self.redis.ping() for _ in range(connections)))
+        except Exception as e:
+            print(f"❌ Redis warm-up error: {e}")
+    
+    async def close(self):
+        """Close the Redis connection pool"""
+        await self.redis.aclose()
 
 
 class InMemoryQueue(QueueStrategy):
     """
-    In-memory queue implementation using Python deque.
+    In-memory queue implementation using asyncio.Queue.
     
     Pros:
     - Simple (no external dependencies)
     - Fast (no network overhead)
     - Good for development and testing
+    - consume() blocks up to block_time like XREADGROUP (no busy loop when idle)
     
     Cons:
     - Not persistent (lost on restart)
@@ -274,19 +501,19 @@ class InMemoryQueue(QueueStrategy):
     
     def __init__(self):
         """Initialize in-memory queues"""
-        self._queues: Dict[str, deque] = {}
+        self._queues: Dict[str, asyncio.Queue] = {}
     
-    def _get_queue(self, queue_name: str) -> deque:
+    def _get_queue(self, queue_name: str) -> asyncio.Queue:
         """Get or create queue"""
         if queue_name not in self._queues:
-            self._queues[queue_name] = deque()
+            self._queues[queue_name] = asyncio.Queue()
         return self._queues[queue_name]
     
     async def publish(self, queue_name: str, message: HitEvent) -> bool:
         """Add message to in-memory queue"""
         try:
             queue = self._get_queue(queue_name)
-            queue.append(message)
+            queue.put_nowait(message)  # Unbounded: never waits
             return True
         except Exception as e:
             print(f"❌ In-memory publish error: {e}")
@@ -301,15 +528,23 @@ class InMemoryQueue(QueueStrategy):
         """
         Consume messages from in-memory queue.
         
-        Note: block_time is ignored (no blocking in this simple implementation)
+        Waits up to block_time (milliseconds) for the first message,
+        then takes up to batch_size - 1 more without waiting.
         """
         try:
             queue = self._get_queue(queue_name)
-            messages = []
             
-            for _ in range(min(batch_size, len(queue))):
-                if queue:
-                    messages.append(queue.popleft())
+            try:
+                first = await asyncio.wait_for(queue.get(), timeout=block_time / 1000)
+            except asyncio.TimeoutError:
+                return []
+            
+            messages = [first]
+            while len(messages) < batch_size:
+                try:
+                    messages.append(queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
             
             return messages
             
@@ -329,5 +564,4 @@ class InMemoryQueue(QueueStrategy):
     async def get_queue_length(self, queue_name: str) -> int:
         """Get queue length"""
         queue = self._get_queue(queue_name)
-        return len(queue)
-
+        return queue.qsize()
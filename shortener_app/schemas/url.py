@@ -1,8 +1,17 @@
+import re
 from pydantic import BaseModel, HttpUrl, Field, computed_field, ConfigDict
 from typing import Optional
 from datetime import datetime
 from shortener_app.config import settings
 
+# Valid short code in path parameters (up to short_url_length). The charset is
+# the union of every strategy's alphabet, not just the configured one, so codes
+# issued before a SHORT_CODE_STRATEGY switch keep resolving.
+# Malformed codes are rejected before any cache/DB lookup.
+SHORT_CODE_CHARSET = "0-9A-Za-z_-"
+SHORT_CODE_PATTERN = rf"^[{SHORT_CODE_CHARSET}]{{1,{settings.short_url_length}}}$"
+SHORT_CODE_RE = re.compile(SHORT_CODE_PATTERN)
+
 
 class URLBase(BaseModel):
     long_url: HttpUrl = Field(..., description="The original URL to be shortened")
@@ -0,0 +1,33 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""
+Optional C implementation of Base62 encoding (hot path for Base62ShortCodeStrategy).
+
+Same alphabet and output as Base62ShortCodeStrategy._base62_encode, but the
+digit loop runs on a uint64_t into a stack buffer - no Python ints or strings
+per digit. Build in place with:
+
+    cythonize -i shortener_app/services/_base62.pyx
+
+If the compiled module is missing, the strategy uses its pure-Python encoder.
+"""
+
+from libc.stdint cimport uint64_t
+
+cdef const char* BASE62_CHARS = b"0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+cpdef str encode(uint64_t number):
+    """Convert a non-negative integer (< 2**64) to a Base62 string"""
+    # 2**64 needs 11 Base62 digits
+    cdef char buf[11]
+    cdef int pos = 11
+
+    if number == 0:
+        return "0"
+
+    while number:
+        pos -= 1
+        buf[pos] = BASE62_CHARS[number % 62]
+        number //= 62
+
+    return (buf + pos)[:11 - pos].decode("ascii")
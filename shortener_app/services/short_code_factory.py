@@ -7,7 +7,8 @@ from enum import Enum
 from shortener_app.services.short_code_strategies import (
     ShortCodeStrategy,
     RandomShortCodeStrategy,
-    Base62ShortCodeStrategy
+    Base62ShortCodeStrategy,
+    Base64UrlShortCodeStrategy
 )
 from shortener_app.config import settings
 
@@ -16,6 +17,7 @@ class ShortCodeStrategyType(Enum):
     """Available short code generation strategies"""
     RANDOM = "random"
     BASE62 = "base62"
+    BASE64URL = "base64url"
 
 
 class ShortCodeFactory:
@@ -61,9 +63,24 @@ class ShortCodeFactory:
                 salt=settings.short_code_salt,
                 max_length=settings.short_url_length
             )
+        elif strategy_type == ShortCodeStrategyType.BASE64URL:
+            instance = Base64UrlShortCodeStrategy(
+                salt=settings.short_code_salt,
+                max_length=settings.short_url_length
+            )
         else:
             raise ValueError(f"Unknown strategy type: {strategy_type}")
         
         # Cache the instance
         cls._instances[strategy_type] = instance
         return instance
+
+
+# Default strategy resolved once at import (settings don't change at runtime),
+# so URLService doesn't re-coerce the setting into an Enum on every request
+_DEFAULT_STRATEGY = ShortCodeFactory.create_strategy()
+
+
+def get_default_strategy() -> ShortCodeStrategy:
+    """Return the strategy configured by settings.short_code_strategy"""
+    return _DEFAULT_STRATEGY
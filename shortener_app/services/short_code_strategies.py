@@ -6,9 +6,20 @@ Uses Strategy Pattern to allow different generation algorithms.
 import string
 import random
 from abc import ABC, abstractmethod
+from typing import Optional
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from shortener_app.models.url import URL
 
+# Optional C encoder (shortener_app/services/_base62.pyx, built with cythonize)
+try:
+    from shortener_app.services._base62 import encode as _c_base62_encode
+except ImportError:
+    _c_base62_encode = None
+
+# Largest value the C encoder accepts (uint64_t)
+_C_ENCODE_MAX = 2 ** 64
+
 
 class ShortCodeStrategy(ABC):
     """Abstract base class for short code generation strategies"""
@@ -26,6 +37,16 @@ class ShortCodeStrategy(ABC):
             A unique short code string
         """
         pass
+    
+    def generate_candidate(self) -> Optional[str]:
+        """
+        Generate a short code without knowing the URL ID or querying the DB.
+        
+        Strategies that can do this return a candidate that the caller
+        inserts directly, letting the unique index reject collisions
+        (retry with a new candidate). Returns None for ID-based strategies.
+        """
+        return None
 
 
 class RandomShortCodeStrategy(ShortCodeStrategy):
@@ -34,7 +55,10 @@ class RandomShortCodeStrategy(ShortCodeStrategy):
     Generates random string and checks database for uniqueness.
     
     Pros: Simple, unpredictable
-    Cons: Collision risk, multiple DB queries, not scalable
+    Cons: Collision risk, DB query per code, not scalable
+    
+    URLService uses generate_candidate() instead: it inserts the random code
+    straight away and retries on a unique-constraint violation (no SELECTs).
     """
     
     def __init__(self, length: int = 5, max_retries: int = 5):
@@ -43,12 +67,22 @@ class RandomShortCodeStrategy(ShortCodeStrategy):
         self.characters = string.ascii_letters + string.digits
     
     def generate(self, url_id: int, db_session: Session) -> str:
-        """Generate random short code with collision checking"""
-        for attempt in range(self.max_retries):
-            short_code = self._generate_random_string()
-            
-            # Check if code already exists
-            if not db_session.query(URL).filter(URL.short_code == short_code).first():
+        """
+        Generate random short code with collision checking.
+        
+        All max_retries candidates are drawn up front and checked with one
+        SELECT ... WHERE short_code IN (...) instead of one query per attempt.
+        """
+        candidates = [self._generate_random_string() for _ in range(self.max_retries)]
+        
+        # Check which candidates already exist (single round-trip)
+        taken = set(
+            db_session.scalars(
+                select(URL.short_code).where(URL.short_code.in_(candidates))
+            )
+        )
+        for short_code in candidates:
+            if short_code not in taken:
                 return short_code
         
         # If all retries failed
@@ -56,9 +90,31 @@ class RandomShortCodeStrategy(ShortCodeStrategy):
             f"Could not generate unique short code after {self.max_retries} attempts"
         )
     
+    def generate_candidate(self) -> Optional[str]:
+        """Random code to insert directly; the unique index catches collisions"""
+        return self._generate_random_string()
+    
     def _generate_random_string(self) -> str:
-        """Generate a random string of specified length"""
-        return ''.join(random.choice(self.characters) for _ in range(self.length))
+        """
+        Generate a random string of specified length.
+        
+        Draws 6 random bits per character in one getrandbits() call (instead
+        of one random.choice() per character). Values 62 and 63 are rejected
+        to keep every character equally likely; rejected slots are refilled
+        from the next draw.
+        """
+        chars = self.characters
+        result = []
+        while len(result) < self.length:
+            bits = random.getrandbits(6 * self.length)
+            for _ in range(self.length):
+                index = bits & 63
+                bits >>= 6
+                if index < 62:
+                    result.append(chars[index])
+                    if len(result) == self.length:
+                        break
+        return "".join(result)
 
 
 class Base62ShortCodeStrategy(ShortCodeStrategy):
@@ -70,11 +126,14 @@ class Base62ShortCodeStrategy(ShortCodeStrategy):
     Cons: Predictable if salt is known (but obfuscated)
     """
     
-    BASE62_CHARS = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    # bytes: the pair table is built from it and codes are decoded to str once
+    BASE62_CHARS = b"0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
     
     def __init__(self, salt: int = 1000, max_length: int = 5):
         self.salt = salt
         self.max_length = max_length
+        # Smallest ID that no longer fits in max_length digits (fixed at startup)
+        self.max_id = 62 ** max_length
     
     def generate(self, url_id: int, db_session: Session) -> str:
         """
@@ -87,6 +146,8 @@ class Base62ShortCodeStrategy(ShortCodeStrategy):
         
         Note: If encoded string exceeds max_length, raise error.
         This indicates salt is too small for the URL volume.
+        The limit is checked on the integer (against max_id), so the
+        common path doesn't measure the encoded string.
         """
         # Obfuscate the ID with salt
         obfuscated_id = url_id + self.salt
@@ -95,7 +156,7 @@ class Base62ShortCodeStrategy(ShortCodeStrategy):
         encoded = self._base62_encode(obfuscated_id)
         
         # Check if exceeds max length (this would cause duplicates if truncated)
-        if len(encoded) > self.max_length:
+        if obfuscated_id >= self.max_id:
             raise ValueError(
                 f"Generated code '{encoded}' exceeds max length {self.max_length}. "
                 f"URL ID: {url_id}, Obfuscated ID: {obfuscated_id}. "
@@ -110,13 +171,84 @@ class Base62ShortCodeStrategy(ShortCodeStrategy):
         
         Base62 uses: 0-9 (10) + a-z (26) + A-Z (26) = 62 characters
         This is more compact than Base10 and URL-safe.
+        
+        Uses the compiled _base62 extension when it is available.
         """
+        if _c_base62_encode is not None and number < _C_ENCODE_MAX:
+            return _c_base62_encode(number)
+        
         if number == 0:
-            return self.BASE62_CHARS[0]
+            return "0"
         
-        result = ""
-        while number > 0:
-            result = self.BASE62_CHARS[number % 62] + result
-            number //= 62
+        # Two digits per divmod via the pair table, most-significant pair last
+        # (collect, reverse once at the end - prepending would copy every time)
+        pairs = []
+        while number:
+            number, remainder = divmod(number, 3844)
+            pairs.append(_BASE62_PAIRS[remainder])
         
-        return result
+        pairs.reverse()
+        encoded = b"".join(pairs)
+        
+        # Most-significant pair may carry a leading zero digit (value < 62)
+        start = 1 if encoded[0] == _BASE62_ZERO else 0
+        return encoded[start:].decode("ascii")
+
+
+class Base64UrlShortCodeStrategy(ShortCodeStrategy):
+    """
+    Base64-url encoding strategy with ID obfuscation.
+    Same scheme as Base62ShortCodeStrategy, with a 64-character alphabet.
+    
+    Pros: Encoding is shift + mask (6 bits per character, no division),
+          more codes per length (64^5 ~ 1.07B)
+    Cons: Codes may contain '-' and '_'
+    """
+    
+    BASE64URL_CHARS = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_"
+    
+    def __init__(self, salt: int = 1000, max_length: int = 5):
+        self.salt = salt
+        self.max_length = max_length
+    
+    def generate(self, url_id: int, db_session: Session) -> str:
+        """
+        Generate short code using Base64-url encoding.
+        
+        Raises:
+            ValueError: If the encoded ID exceeds max_length
+        """
+        obfuscated_id = url_id + self.salt
+        encoded = self._base64url_encode(obfuscated_id)
+        
+        if len(encoded) > self.max_length:
+            raise ValueError(
+                f"Generated code '{encoded}' exceeds max length {self.max_length}. "
+                f"URL ID: {url_id}, Obfuscated ID: {obfuscated_id}. "
+                f"Consider increasing salt or max_length to handle higher volume."
+            )
+        
+        return encoded
+    
+    def _base64url_encode(self, number: int) -> str:
+        """Convert integer to Base64-url string (6 bits per character)"""
+        if number == 0:
+            return "A"
+        
+        chars = self.BASE64URL_CHARS
+        out = bytearray()
+        while number:
+            out.append(chars[number & 0x3F])
+            number >>= 6
+        
+        out.reverse()
+        return out.decode("ascii")
+
+
+# All 62 * 62 = 3844 two-digit Base62 byte strings, indexed by value (built once at import)
+_BASE62_PAIRS = [
+    bytes((high, low))
+    for high in Base62ShortCodeStrategy.BASE62_CHARS
+    for low in Base62ShortCodeStrategy.BASE62_CHARS
+]
+_BASE62_ZERO = Base62ShortCodeStrategy.BASE62_CHARS[0]
@@ -1,16 +1,44 @@
-from typing import Union, Optional
+import asyncio
+from typing import Union, Optional, List, Dict, Set
 
 from pydantic import HttpUrl
-from sqlalchemy.orm import Session
-from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, bindparam, func
+from sqlalchemy.exc import IntegrityError
 from shortener_app.models.url import URL
 from shortener_app.schemas.url import URLResponse, URLStats
 from shortener_app.config import settings
-from shortener_app.services.short_code_factory import ShortCodeFactory
+from shortener_app.services.short_code_factory import get_default_strategy
 from shortener_app.services.short_code_strategies import ShortCodeStrategy
-from shortener_app.cache.strategies import CacheStrategy
+from shortener_app.cache.strategies import CacheStrategy, CACHE_MISS_SENTINEL
 from shortener_app.queue.strategies import QueueStrategy
 
+# Strong references to fire-and-forget cache writes (the event loop only
+# keeps weak ones, so an unreferenced task could be garbage collected)
+_background_tasks: Set[asyncio.Task] = set()
+
+# Sequence behind urls.id on PostgreSQL (SERIAL default name)
+URL_ID_SEQUENCE = "urls_id_seq"
+
+# Redirect-miss query: selects only long_url (no ORM row/identity-map overhead).
+# Built once at import; SQLAlchemy caches its compiled form across calls.
+LONG_URL_STMT = select(URL.long_url).where(
+    URL.short_code == bindparam("short_code"),
+    URL.is_active == True
+)
+
+# Full-row lookup of an active URL by short code (API reads need every column)
+ACTIVE_URL_BY_CODE_STMT = select(URL).where(
+    URL.short_code == bindparam("short_code"),
+    URL.is_active == True
+)
+
+# Stats lookup: only the columns URLStats needs, as a plain row (no ORM object).
+# Not filtered on is_active - stats include deleted URLs.
+URL_STATS_STMT = select(
+    URL.short_code, URL.total_hits, URL.created_at, URL.updated_at
+).where(URL.short_code == bindparam("short_code"))
+
 
 class URLService:
     """
@@ -22,11 +50,16 @@ class URLService:
     - Flexible (swap implementations without changing code)
     
     Similar to Django's service layer pattern.
+    
+    One instance is built per request, so it is slotted (no per-instance
+    __dict__) and only stores references - no lookups in __init__.
     """
     
+    __slots__ = ("db", "cache", "queue", "short_code_strategy")
+    
     def __init__(
         self, 
-        db: Session,
+        db: AsyncSession,
         cache: Optional[CacheStrategy] = None,
         queue: Optional[QueueStrategy] = None
     ):
@@ -34,15 +67,15 @@ class URLService:
         Initialize URL service with dependencies.
         
         Args:
-            db: Database session
+            db: Async database session
             cache: Cache strategy (optional, for performance)
             queue: Queue strategy (optional, for async hit tracking)
         """
         self.db = db
         self.cache = cache
         self.queue = queue
-        # Use provided strategy or create default from factory
-        self.short_code_strategy = ShortCodeFactory.create_strategy()
+        # Default strategy from settings (resolved once at import)
+        self.short_code_strategy = get_default_strategy()
 
     async def create_short_url(self, long_url: HttpUrl) -> URL:
         """Create a new short URL
@@ -51,50 +84,122 @@ class URLService:
         This allows tracking different sources/campaigns for the same destination URL.
         
         Process:
-        1. Create URL with placeholder short_code to get auto-increment ID
-        2. Generate actual short_code using ID
-        3. Update with final short_code
+        1. Reserve the next URL ID (sequence / max(id) + 1)
+        2. Generate short_code from that ID
+        3. INSERT the row with both (no placeholder INSERT + UPDATE)
         4. Cache the mapping (async I/O - non-blocking)
         
+        Strategies that don't need the ID (random) skip 1-2: their code is
+        inserted directly and retried on collision (_insert_with_candidate).
+        
         Returns the SQLAlchemy model instance - Pydantic will auto-serialize it!
         
-        Note: This is async because of cache.set() (Redis I/O).
-        Database operations are still sync - that's fine!
+        Note: Database and cache operations are both async (non-blocking).
         """
-        # Create URL record with placeholder to get auto-increment ID
-        # The short_code can be None (nullable) during creation
-        url = URL(long_url=str(long_url), short_code=None)
-        self.db.add(url)
-        self.db.flush()  # Flush to get ID without committing (sync - fast)
-        
-        # Now url.id is available - generate short code using strategy
-        url.short_code = self.short_code_strategy.generate(url.id, self.db)
+        candidate = self.short_code_strategy.generate_candidate()
+        if candidate is not None:
+            # Code doesn't depend on the ID (random): insert it directly
+            url = await self._insert_with_candidate(long_url, candidate)
+        else:
+            # Code is derived from the ID (Base62): reserve the ID first
+            url = await self._insert_with_reserved_id(long_url)
         
-        # Commit with final short code (sync - fast)
-        self.db.commit()
-        self.db.refresh(url)
+        # Commit (flushes the INSERT)
+        await self.db.commit()
+        await self.db.refresh(url)  # Load server defaults (created_at)
         
-        # Cache the mapping for fast lookups (async - non-blocking!)
+        # Drop any negative-cache entry left by earlier lookups of this code
+        # (Base62 codes are predictable); the first redirect caches the URL
         if self.cache:
-            cache_key = f"url:{url.short_code}"
-            await self.cache.set(cache_key, url.long_url, ttl=settings.cache_ttl)
+            await self.cache.delete(f"url:{url.short_code}")
 
         # Return the model instance directly!
         # Pydantic will automatically serialize it using from_attributes=True
         return url
 
+    async def _reserve_url_id(self) -> int:
+        """
+        Get the ID the next URL row will use.
+        
+        PostgreSQL: nextval() on the id sequence (never handed out twice).
+        Others (SQLite): max(id) + 1, which concurrent creators can both
+        read - the primary key rejects the second INSERT and it retries.
+        """
+        if self._ids_from_sequence:
+            return (await self.db.execute(select(func.nextval(URL_ID_SEQUENCE)))).scalar_one()
+        return (await self.db.execute(select(func.coalesce(func.max(URL.id), 0) + 1))).scalar_one()
+
+    async def _insert_with_reserved_id(self, long_url: HttpUrl) -> URL:
+        """
+        Insert a URL whose short code is derived from its ID, in one INSERT.
+        
+        Raises:
+            Exception: If the reserved ID kept being taken for max_retries attempts
+        """
+        for attempt in range(settings.max_retries):
+            url_id = await self._reserve_url_id()
+            
+            # Strategies use the sync Session API, so run them via run_sync
+            short_code = await self.db.run_sync(
+                lambda session: self.short_code_strategy.generate(url_id, session)
+            )
+            url = URL(id=url_id, long_url=str(long_url), short_code=short_code)
+            
+            if self._ids_from_sequence:
+                # Sequence IDs can't clash: no SAVEPOINT round-trips needed
+                self.db.add(url)
+                return url
+            
+            try:
+                async with self.db.begin_nested():
+                    self.db.add(url)
+                return url
+            except IntegrityError:
+                continue  # Another request took this ID - reserve again
+        
+        raise Exception(
+            f"Could not reserve a URL ID after {settings.max_retries} attempts"
+        )
+
+    @property
+    def _ids_from_sequence(self) -> bool:
+        """Whether the database hands out IDs from a sequence (PostgreSQL)"""
+        return self.db.bind.dialect.name == "postgresql"
+
+    async def _insert_with_candidate(self, long_url: HttpUrl, short_code: str) -> URL:
+        """
+        Insert a URL with a pre-generated short code, retrying on collision.
+        
+        Each attempt runs in a SAVEPOINT: if the unique index rejects the
+        code, only that INSERT is rolled back and a new candidate is tried.
+        One round-trip per attempt and no check-then-insert race.
+        
+        Raises:
+            Exception: If no unique code was found within max_retries attempts
+        """
+        for attempt in range(settings.max_retries):
+            url = URL(long_url=str(long_url), short_code=short_code)
+            try:
+                async with self.db.begin_nested():
+                    self.db.add(url)
+                return url
+            except IntegrityError:
+                short_code = self.short_code_strategy.generate_candidate()
+        
+        raise Exception(
+            f"Could not generate unique short code after {settings.max_retries} attempts"
+        )
+
     async def get_url_by_short_code(self, short_code: str) -> Union[URL, None]:
         """Get URL by short code
         
         Returns SQLAlchemy model instance or None.
         Pydantic will auto-serialize it to URLResponse schema.
         
-        Note: Async for interface consistency, DB query is sync (fast).
+        Note: DB query is async (non-blocking).
         """
-        url = self.db.query(URL).filter(
-            URL.short_code == short_code,
-            URL.is_active == True
-        ).first()
+        result = await self.db.execute(ACTIVE_URL_BY_CODE_STMT, {"short_code": short_code})
+        url = result.scalar_one_or_none()
         
         # Return the model instance directly (or None)
         # Just like DRF: serializer = URLSerializer(url) → url gets serialized automatically
@@ -109,69 +214,152 @@ class URLService:
         
         Flow:
         1. Check cache first (async I/O - ~0.1ms)
-        2. If cache miss, query database (sync - ~2ms)
-        3. Populate cache for next time (async I/O - ~0.1ms)
+        2. If cache miss, query database (async I/O - ~2ms)
+        3. Populate cache for next time in a background task
+           (the response doesn't wait for the cache write)
+           Unknown codes are cached too (CACHE_MISS_SENTINEL, short TTL)
         4. Return long URL
         
         Performance: ~0.1ms for cache hit, ~2ms for cache miss
         
-        Note: Async for cache I/O, DB query is sync (mixing is fine!)
+        Note: Both cache and DB I/O are async, so a cache miss
+        doesn't block other requests on the event loop.
         """
         cache_key = f"url:{short_code}"
         
         # Step 1: Try cache first (Cache-Aside Pattern) - ASYNC I/O
         if self.cache:
             cached_url = await self.cache.get(cache_key)
+            if cached_url == CACHE_MISS_SENTINEL:
+                # Negative cache HIT - code is known not to exist
+                return None
             if cached_url:
                 # Cache HIT - return immediately
                 return cached_url
         
-        # Step 2: Cache MISS - query database (SYNC - fast with indexes)
-        url = self.db.query(URL).filter(
-            URL.short_code == short_code,
-            URL.is_active == True
-        ).first()
+        # Step 2: Cache MISS - query database (ASYNC I/O - fast with indexes)
+        # Only the long_url column is fetched (short_code is unique)
+        result = await self.db.execute(LONG_URL_STMT, {"short_code": short_code})
+        long_url = result.scalar_one_or_none()
         
-        if not url:
+        if long_url is None:
+            # Remember the miss briefly so repeated lookups skip the DB
+            if self.cache:
+                self._cache_in_background(cache_key, CACHE_MISS_SENTINEL, settings.cache_negative_ttl)
             return None
         
-        # Step 3: Populate cache for next time - ASYNC I/O
+        # Step 3: Populate cache for next time - fire-and-forget
         if self.cache:
-            await self.cache.set(cache_key, url.long_url, ttl=settings.cache_ttl)
+            self._cache_in_background(cache_key, long_url, settings.cache_ttl)
         
         # Step 4: Return long URL
-        return url.long_url
+        return long_url
+
+    def _cache_in_background(self, key: str, value: str, ttl: int):
+        """
+        Write a cache entry without waiting for it (fire-and-forget).
+        
+        Cache strategies swallow their own errors, so a failed write
+        only means the next lookup misses again.
+        """
+        task = asyncio.create_task(self.cache.set(key, value, ttl=ttl))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+    async def bulk_get_long_urls(self, short_codes: List[str]) -> Dict[str, Optional[str]]:
+        """
+        Get long URLs for many short codes (for warmup scripts and batch processors).
+        
+        Same Cache-Aside pattern as get_long_url_for_redirect, but batched:
+        1. One cache MGET for all codes
+        2. One DB query (WHERE short_code IN ...) for the cache misses
+        3. Populate cache for codes found in DB
+        
+        Returns:
+            Dict mapping each short code to its long URL (None if not found/inactive)
+        """
+        results: Dict[str, Optional[str]] = dict.fromkeys(short_codes)
+        missing = list(results)
+        
+        # Step 1: Batch cache lookup (one round-trip)
+        if self.cache and missing:
+            cached_urls = await self.cache.mget([f"url:{code}" for code in missing])
+            cached = {
+                code: cached_url for code, cached_url in zip(missing, cached_urls) if cached_url
+            }
+            results.update(
+                (code, None if cached_url == CACHE_MISS_SENTINEL else cached_url)
+                for code, cached_url in cached.items()
+            )
+            missing = [code for code in missing if code not in cached]
+        
+        if not missing:
+            return results
+        
+        # Step 2: One DB query for all cache misses
+        rows = await self.db.execute(
+            select(URL.short_code, URL.long_url).where(
+                URL.short_code.in_(missing),
+                URL.is_active == True
+            )
+        )
+        found = dict(rows.all())
+        results.update(found)
+        
+        # Step 3: Populate cache for next time (negative entries for codes not found)
+        # One batched write per TTL instead of a round-trip per code
+        if self.cache:
+            if found:
+                await self.cache.mset(
+                    {f"url:{code}": long_url for code, long_url in found.items()},
+                    ttl=settings.cache_ttl
+                )
+            not_found = [code for code in missing if code not in found]
+            if not_found:
+                await self.cache.mset(
+                    dict.fromkeys((f"url:{code}" for code in not_found), CACHE_MISS_SENTINEL),
+                    ttl=settings.cache_negative_ttl
+                )
+        
+        return results
 
     async def get_url_stats(self, short_code: str) -> Optional[URLStats]:
         """Get statistics for a short URL
         
-        Note: Async for interface consistency, DB query is sync (fast).
+        Note: DB query is async (non-blocking).
         """
-        url = self.db.query(URL).filter(URL.short_code == short_code).first()
+        result = await self.db.execute(URL_STATS_STMT, {"short_code": short_code})
+        row = result.one_or_none()
 
-        if not url:
+        if row is None:
             return None
 
         return URLStats(
-            short_code=url.short_code,
-            total_hits=url.total_hits,  # Use total_hits instead of hits
-            created_at=url.created_at,
-            last_accessed=url.updated_at
+            short_code=row.short_code,
+            total_hits=row.total_hits,  # Use total_hits instead of hits
+            created_at=row.created_at,
+            last_accessed=row.updated_at
         )
 
     async def delete_url(self, short_code: str) -> bool:
         """
         Delete a short URL (soft delete).
         Also invalidates cache (async I/O).
+        
+        A single UPDATE (no SELECT + ORM load first); rowcount tells
+        whether the short code exists.
         """
-        url = self.db.query(URL).filter(URL.short_code == short_code).first()
+        result = await self.db.execute(
+            update(URL)
+            .where(URL.short_code == short_code)
+            .values(is_active=False)
+            .execution_options(synchronize_session=False)
+        )
+        await self.db.commit()
         
-        if not url:
+        if not result.rowcount:
             return False
         
-        url.is_active = False
-        self.db.commit()
-        
         # Invalidate cache (async I/O)
         if self.cache:
             cache_key = f"url:{short_code}"
@@ -5,13 +5,19 @@ This module implements the Strategy Pattern for pluggable analytics storage.
 Separates transactional data (main DB) from analytical data (specialized DB).
 """
 
-from .strategies import HitStorageStrategy, SQLiteHitStorage, ClickHouseHitStorage
+from .strategies import (
+    HitStorageStrategy,
+    SQLiteHitStorage,
+    ClickHouseHitStorage,
+    CachedHitStorage,
+)
 from .factory import HitStorageFactory, HitStorageBackend
 
 __all__ = [
     "HitStorageStrategy",
     "SQLiteHitStorage",
     "ClickHouseHitStorage",
+    "CachedHitStorage",
     "HitStorageFactory",
     "HitStorageBackend",
 ]
@@ -1,10 +1,16 @@
 """
 Factory for creating hit storage instances.
-Simple, clean factory with singleton caching.
+Simple, clean factory with per-backend caching.
 """
 
 from enum import Enum
-from .strategies import HitStorageStrategy, SQLiteHitStorage, ClickHouseHitStorage
+from functools import lru_cache
+from .strategies import (
+    HitStorageStrategy,
+    SQLiteHitStorage,
+    ClickHouseHitStorage,
+    CachedHitStorage,
+)
 from shortener_app.config import settings
 
 
@@ -14,15 +20,50 @@ class HitStorageBackend(Enum):
     CLICKHOUSE = "clickhouse"
 
 
+@lru_cache(maxsize=None)
+def _build(backend: HitStorageBackend) -> HitStorageStrategy:
+    """Create a hit storage instance (cached: one instance per backend)"""
+    storage = _build_backend(backend)
+
+    # Short-lived read cache: repeated dashboard reads skip the database
+    if settings.hit_storage_read_cache_ttl > 0:
+        return CachedHitStorage(
+            storage,
+            max_size=settings.hit_storage_read_cache_max_size,
+            ttl=settings.hit_storage_read_cache_ttl
+        )
+    return storage
+
+
+def _build_backend(backend: HitStorageBackend) -> HitStorageStrategy:
+    """Create the storage for a backend"""
+    if backend == HitStorageBackend.SQLITE:
+        instance = SQLiteHitStorage(db_path=settings.hit_storage_sqlite_path)
+        print(f"✅ SQLite hit storage initialized")
+        return instance
+
+    elif backend == HitStorageBackend.CLICKHOUSE:
+        instance = ClickHouseHitStorage(
+            url=settings.hit_storage_clickhouse_url,
+            buffer_size=settings.hit_storage_buffer_size,
+            flush_interval=settings.hit_storage_flush_interval
+        )
+        print(f"✅ ClickHouse hit storage initialized (interface only)")
+        return instance
+
+    else:
+        raise ValueError(f"Unknown storage backend: {backend}")
+
+
 class HitStorageFactory:
     """
     Simple factory for creating hit storage instances.
     
     Gets configuration from settings (not passed as parameters).
+    Instances are cached per backend (lru_cache on _build), so asking
+    for a different backend returns that backend, not the first one built.
     """
     
-    _instance: HitStorageStrategy = None  # Single cached instance
-    
     @classmethod
     def create(cls, backend: HitStorageBackend) -> HitStorageStrategy:
         """
@@ -32,31 +73,11 @@ class HitStorageFactory:
             backend: Type of storage backend (from enum)
             
         Returns:
-            Singleton hit storage instance
+            Cached hit storage instance for this backend
         """
-        # Return cached instance if exists
-        if cls._instance is not None:
-            return cls._instance
-        
-        # Create new instance based on backend type
-        if backend == HitStorageBackend.SQLITE:
-            cls._instance = SQLiteHitStorage(db_path=settings.hit_storage_sqlite_path)
-            print(f"✅ SQLite hit storage initialized")
-            
-        elif backend == HitStorageBackend.CLICKHOUSE:
-            cls._instance = ClickHouseHitStorage(
-                url=settings.hit_storage_clickhouse_url,
-                buffer_size=settings.hit_storage_buffer_size
-            )
-            print(f"✅ ClickHouse hit storage initialized (interface only)")
-            
-        else:
-            raise ValueError(f"Unknown storage backend: {backend}")
-        
-        return cls._instance
+        return _build(backend)
     
     @classmethod
     def clear_instance(cls):
-        """Clear cached instance (for testing)"""
-        cls._instance = None
-
+        """Clear cached instances (for testing)"""
+        _build.cache_clear()
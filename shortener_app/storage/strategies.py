@@ -9,12 +9,22 @@ Allows switching between different analytics databases:
 """
 
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional
+from collections import OrderedDict
+from operator import attrgetter
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 import sqlite3
 import asyncio
+import threading
+import time
+import gzip
+from contextlib import suppress
+import httpx
+import orjson
 from shortener_app.queue.models import HitEvent
 
+EPOCH = datetime(1970, 1, 1)
+
 
 class HitStorageStrategy(ABC):
     """
@@ -91,6 +101,66 @@ class HitStorageStrategy(ABC):
     ) -> List[Dict]:
         """Get hits over time (daily)"""
         pass
+    
+    async def get_hits_breakdown(self, short_code: str) -> Dict[str, Dict[str, int]]:
+        """
+        Get hits grouped by device type, browser and country in one call.
+        
+        Default: the three per-dimension queries. Backends that can answer
+        all three in one round-trip override this.
+        
+        Returns:
+            {"device_type": {...}, "browser": {...}, "country": {...}}
+        """
+        return {
+            "device_type": await self.get_hits_by_device(short_code),
+            "browser": await self.get_hits_by_browser(short_code),
+            "country": await self.get_hits_by_country(short_code),
+        }
+    
+    async def get_dashboard(
+        self,
+        short_code: str,
+        referer_limit: int = 10,
+        days: int = 7
+    ) -> Dict[str, Any]:
+        """
+        Get everything an analytics dashboard shows for a URL in one call.
+        
+        The queries are independent, so they run concurrently
+        (asyncio.gather): latency is the slowest query, not their sum.
+        
+        Args:
+            short_code: Short code to report on
+            referer_limit: Number of top referers
+            days: Number of days in the time series
+            
+        Returns:
+            {"total_hits", "breakdown", "top_referers", "hits_over_time"}
+        """
+        total_hits, breakdown, top_referers, hits_over_time = await asyncio.gather(
+            self.get_total_hits(short_code),
+            self.get_hits_breakdown(short_code),
+            self.get_top_referers(short_code, referer_limit),
+            self.get_hits_over_time(short_code, days),
+        )
+        return {
+            "total_hits": total_hits,
+            "breakdown": breakdown,
+            "top_referers": top_referers,
+            "hits_over_time": hits_over_time,
+        }
+    
+    async def warm_up(self):
+        """
+        Prepare the backend ahead of traffic (called on worker startup).
+        No-op by default (backends set up in their constructor).
+        """
+        pass
+    
+    async def close(self):
+        """Release connections (called on shutdown). No-op by default."""
+        pass
 
 
 class SQLiteHitStorage(HitStorageStrategy):
@@ -113,6 +183,37 @@ class SQLiteHitStorage(HitStorageStrategy):
     - Development environment
     - Demos and testing
     - Low-traffic applications (<1M hits/day)
+    
+    One connection is opened in __init__ and reused by every call
+    (guarded by a lock) instead of connect/close per query.
+    """
+    
+    # Applied once to the persistent connection:
+    # - WAL: analytics reads don't block on the worker's inserts
+    # - synchronous=NORMAL: safe with WAL, far fewer fsyncs
+    # - temp_store/cache_size/mmap_size: GROUP BY temp data in memory,
+    #   ~64MB page cache, reads via a 256MB memory map
+    PRAGMAS = (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA cache_size=-64000",
+        "PRAGMA mmap_size=268435456",
+    )
+    
+    # Columns the analytics queries group/filter on per short code
+    COVERED_COLUMNS = ("day", "device_type", "browser", "country", "referer")
+    
+    # UTC day number (days since 1970-01-01) of the ISO timestamp. A virtual
+    # generated column: the value is stored only in its index, so time-series
+    # queries group integers instead of parsing every row's timestamp string.
+    DAY_EXPR = "CAST(strftime('%s', timestamp) AS INTEGER) / 86400"
+    
+    INSERT_SQL = """
+        INSERT INTO url_hits (
+            short_code, timestamp, ip_address, user_agent,
+            referer, country, device_type, browser
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
     """
     
     def __init__(self, db_path: str = "analytics.db"):
@@ -123,12 +224,24 @@ class SQLiteHitStorage(HitStorageStrategy):
             db_path: Path to SQLite database file
         """
         self.db_path = db_path
+        # check_same_thread=False: the lock, not the opening thread, serializes access
+        # isolation_level=None: no implicit transactions - writes use explicit BEGIN IMMEDIATE
+        # cached_statements: prepared statements are reused per SQL string; every
+        # query here is a constant string, so after warm-up none is re-parsed
+        self._conn = sqlite3.connect(
+            db_path,
+            check_same_thread=False,
+            isolation_level=None,
+            cached_statements=256,
+        )
+        self._lock = threading.Lock()
+        for pragma in self.PRAGMAS:
+            self._conn.execute(pragma)
         self._init_database()
     
     def _init_database(self):
         """Create analytics table if it doesn't exist"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self._conn.cursor()
         
         # Create table
         cursor.execute("""
@@ -141,35 +254,65 @@ class SQLiteHitStorage(HitStorageStrategy):
                 referer TEXT,
                 country TEXT,
                 device_type TEXT,
-                browser TEXT
+                browser TEXT,
+                day INTEGER GENERATED ALWAYS AS (DAY_EXPR) VIRTUAL
+            )
+        """.replace("DAY_EXPR", self.DAY_EXPR))
+        
+        # Tables created before the day column existed
+        columns = {row[1] for row in cursor.execute("PRAGMA table_xinfo(url_hits)")}
+        if "day" not in columns:
+            cursor.execute(
+                f"ALTER TABLE url_hits ADD COLUMN day INTEGER "
+                f"GENERATED ALWAYS AS ({self.DAY_EXPR}) VIRTUAL"
             )
-        """)
         
         # Create indexes separately (SQLite syntax)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_short_code 
-            ON url_hits(short_code)
-        """)
+        # Composite (short_code, <column>) indexes cover each aggregate query:
+        # SQLite reads only the matching index entries, never the table rows
+        for column in self.COVERED_COLUMNS:
+            cursor.execute(f"""
+                CREATE INDEX IF NOT EXISTS idx_short_code_{column}
+                ON url_hits(short_code, {column})
+            """)
+        
+        # short_code alone is a prefix of every composite index above;
+        # (short_code, timestamp) was replaced by (short_code, day)
+        cursor.execute("DROP INDEX IF EXISTS idx_short_code")
+        cursor.execute("DROP INDEX IF EXISTS idx_short_code_timestamp")
         
         cursor.execute("""
             CREATE INDEX IF NOT EXISTS idx_timestamp 
             ON url_hits(timestamp)
         """)
         
-        conn.commit()
-        conn.close()
+        # Refresh planner statistics if they are stale/missing (cheap no-op otherwise)
+        cursor.execute("PRAGMA optimize")
+        
         print("✅ SQLite analytics database initialized")
     
+    async def close(self):
+        """Update planner statistics and close the persistent connection"""
+        with self._lock:
+            self._conn.execute("PRAGMA optimize")
+            self._conn.close()
+    
     async def store_hit(self, event: HitEvent) -> bool:
         """Store single hit event"""
         return await self.store_hits([event])
     
     async def store_hits(self, events: List[HitEvent]) -> bool:
-        """Store multiple hit events"""
+        """
+        Store multiple hit events.
+        
+        sqlite3 is blocking, so the write runs in a worker thread
+        (asyncio.to_thread) - the event loop keeps serving meanwhile.
+        
+        The whole batch is one explicit transaction. BEGIN IMMEDIATE takes
+        the write lock up front, so a concurrent writer waits at BEGIN
+        instead of failing to upgrade a read lock mid-transaction.
+        """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
             # Prepare data for bulk insert
             data = [
                 (
@@ -185,90 +328,77 @@ class SQLiteHitStorage(HitStorageStrategy):
                 for event in events
             ]
             
-            # Bulk insert
-            cursor.executemany("""
-                INSERT INTO url_hits (
-                    short_code, timestamp, ip_address, user_agent,
-                    referer, country, device_type, browser
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, data)
-            
-            conn.commit()
-            conn.close()
+            await asyncio.to_thread(self._insert_rows, data)
             return True
             
         except Exception as e:
             print(f"❌ SQLite storage error: {e}")
             return False
     
+    def _insert_rows(self, data: List[tuple]):
+        """Insert rows in one transaction (blocking - run via asyncio.to_thread)"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(self.INSERT_SQL, data)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+    
+    def _run_query(self, query: str, params: tuple) -> List[tuple]:
+        """Run a read query on the shared connection (blocking - run via asyncio.to_thread)"""
+        with self._lock:
+            return self._conn.execute(query, params).fetchall()
+    
+    async def _fetchall(self, query: str, params: tuple) -> List[tuple]:
+        """Run a read query in a worker thread (keeps the event loop free)"""
+        return await asyncio.to_thread(self._run_query, query, params)
+    
     async def get_total_hits(self, short_code: str) -> int:
         """Get total hits"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute(
+        rows = await self._fetchall(
             "SELECT COUNT(*) FROM url_hits WHERE short_code = ?",
             (short_code,)
         )
-        
-        result = cursor.fetchone()[0]
-        conn.close()
-        return result
+        return rows[0][0]
     
     async def get_hits_by_device(self, short_code: str) -> Dict[str, int]:
         """Get hits by device type"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
+        rows = await self._fetchall("""
             SELECT device_type, COUNT(*) as count
             FROM url_hits
             WHERE short_code = ?
             GROUP BY device_type
         """, (short_code,))
         
-        results = {row[0] or "unknown": row[1] for row in cursor.fetchall()}
-        conn.close()
-        return results
+        return {row[0] or "unknown": row[1] for row in rows}
     
     async def get_hits_by_browser(self, short_code: str) -> Dict[str, int]:
         """Get hits by browser"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
+        rows = await self._fetchall("""
             SELECT browser, COUNT(*) as count
             FROM url_hits
             WHERE short_code = ?
             GROUP BY browser
         """, (short_code,))
         
-        results = {row[0] or "unknown": row[1] for row in cursor.fetchall()}
-        conn.close()
-        return results
+        return {row[0] or "unknown": row[1] for row in rows}
     
     async def get_hits_by_country(self, short_code: str) -> Dict[str, int]:
         """Get hits by country"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
+        rows = await self._fetchall("""
             SELECT country, COUNT(*) as count
             FROM url_hits
             WHERE short_code = ?
             GROUP BY country
         """, (short_code,))
         
-        results = {row[0] or "unknown": row[1] for row in cursor.fetchall()}
-        conn.close()
-        return results
+        return {row[0] or "unknown": row[1] for row in rows}
     
     async def get_top_referers(self, short_code: str, limit: int = 10) -> List[Dict]:
         """Get top referers"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
+        rows = await self._fetchall("""
             SELECT referer, COUNT(*) as count
             FROM url_hits
             WHERE short_code = ? AND referer IS NOT NULL
@@ -277,32 +407,33 @@ class SQLiteHitStorage(HitStorageStrategy):
             LIMIT ?
         """, (short_code, limit))
         
-        results = [{"referer": row[0], "count": row[1]} for row in cursor.fetchall()]
-        conn.close()
-        return results
+        return [{"referer": row[0], "count": row[1]} for row in rows]
     
     async def get_hits_over_time(
         self, 
         short_code: str, 
         days: int = 7
     ) -> List[Dict]:
-        """Get hits over time"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        """
+        Get hits over time.
         
-        start_date = (datetime.utcnow() - timedelta(days=days)).isoformat()
+        Groups on the integer day column; the first day of the range is
+        counted in full (same daily buckets as the ClickHouse rollup).
+        """
+        start_day = (datetime.utcnow() - timedelta(days=days) - EPOCH).days
         
-        cursor.execute("""
-            SELECT DATE(timestamp) as date, COUNT(*) as count
+        rows = await self._fetchall("""
+            SELECT day, COUNT(*) as count
             FROM url_hits
-            WHERE short_code = ? AND timestamp >= ?
-            GROUP BY DATE(timestamp)
-            ORDER BY date
-        """, (short_code, start_date))
-        
-        results = [{"date": row[0], "count": row[1]} for row in cursor.fetchall()]
-        conn.close()
-        return results
+            WHERE short_code = ? AND day >= ?
+            GROUP BY day
+            ORDER BY day
+        """, (short_code, start_day))
+        
+        return [
+            {"date": (EPOCH + timedelta(days=row[0])).date().isoformat(), "count": row[1]}
+            for row in rows
+        ]
 
 
 class ClickHouseHitStorage(HitStorageStrategy):
@@ -332,23 +463,143 @@ class ClickHouseHitStorage(HitStorageStrategy):
     Performance comparison:
     - SQLite: 5000ms for 10M row aggregation
     - ClickHouse: 50ms for 10M row aggregation (100x faster!)
+    
+    Talks to the HTTP interface through one httpx.AsyncClient: requests
+    are awaited (the event loop keeps running) and reuse keep-alive
+    connections instead of a new TCP handshake per query.
     """
     
-    def __init__(self, url: str = "http://localhost:8123", buffer_size: int = 1000):
+    # Read queries filter with PREWHERE short_code = ...: only the short_code
+    # column is read to find matching rows, other columns only for those rows.
+    #
+    # Read query settings:
+    # - numbers in FORMAT JSON output as JSON numbers (UInt64 is quoted by default)
+    # - query result cache (ClickHouse 23.1+): repeated dashboard queries are
+    #   identical text (values are bound parameters), so they share entries
+    # - aggregation in order: queries GROUP BY a prefix of the table's sorting
+    #   key, so ClickHouse aggregates while streaming (no hash table)
+    QUERY_SETTINGS = {
+        "output_format_json_quote_64bit_integers": 0,
+        "use_query_cache": 1,
+        "optimize_aggregation_in_order": 1,
+    }
+    
+    # Rollups of url_hits: SummingMergeTree merges rows with the same key by
+    # adding up `hits`, so a code's breakdown is a handful of rows instead of
+    # every raw hit. Maps view name -> (engine clauses, SELECT over url_hits).
+    # A view only sees inserts made after it was created. A newly created view
+    # is split on a cutoff: the view keeps hits stamped at or after it, and a
+    # one-time backfill copies the ones before it from url_hits.
+    ROLLUP_VIEWS = {
+        **{
+            f"url_hits_by_{column}_mv": (
+                f"ORDER BY (short_code, {column})",
+                f"""
+                    SELECT short_code, {column}, count() AS hits
+                    FROM url_shortener.url_hits
+                    WHERE_CLAUSE
+                    GROUP BY short_code, {column}
+                """,
+            )
+            for column in ("device_type", "browser", "country")
+        },
+        "url_hits_daily_mv": (
+            "PARTITION BY toYYYYMM(date) ORDER BY (short_code, date)",
+            """
+                SELECT short_code, toDate(timestamp) AS date, count() AS hits
+                FROM url_shortener.url_hits
+                WHERE_CLAUSE
+                GROUP BY short_code, date
+            """,
+        ),
+    }
+    # Cutoff is this far in the future when the view is created, so no hit
+    # stamped at or after it can have been inserted before the view existed
+    ROLLUP_CUTOFF_MARGIN = 10
+    # Backfill waits this long past the cutoff, so hits stamped before it that
+    # are still in the queue/worker have reached url_hits first
+    ROLLUP_BACKFILL_DELAY = 120
+    # ClickHouse error code for CREATE of an existing table/view
+    TABLE_ALREADY_EXISTS = "57"
+    
+    BREAKDOWN_COLUMNS = ("device_type", "browser", "country")
+    BREAKDOWN_QUERY = " UNION ALL ".join(
+        f"""
+            SELECT '{column}' AS dimension, {column} AS value, sum(hits) AS count
+            FROM url_shortener.url_hits_by_{column}_mv
+            PREWHERE short_code = {{short_code:String}}
+            GROUP BY short_code, {column}
+        """
+        for column in BREAKDOWN_COLUMNS
+    ) + " FORMAT JSON"
+    
+    INSERT_COLUMNS = (
+        "short_code", "timestamp", "ip_address", "user_agent",
+        "referer", "country", "device_type", "browser",
+    )
+    _ROW_FIELDS = attrgetter(*INSERT_COLUMNS)
+    INSERT_QUERY = "INSERT INTO url_shortener.url_hits FORMAT JSONColumns"
+    # Timestamps arrive as ISO 8601 with offset (orjson's datetime format);
+    # null optional fields become '' (column default)
+    INSERT_SETTINGS = {
+        "date_time_input_format": "best_effort",
+        "input_format_null_as_default": 1,
+    }
+    # Insert bodies are gzipped: user agents/referers repeat heavily within
+    # a batch, so level 1 already shrinks them several times at little CPU.
+    # ClickHouse decodes Content-Encoding on the HTTP interface natively.
+    INSERT_COMPRESSLEVEL = 1
+    INSERT_HEADERS = {"Content-Encoding": "gzip"}
+    
+    def __init__(
+        self,
+        url: str = "http://localhost:8123",
+        buffer_size: int = 1000,
+        flush_interval: float = 0.2
+    ):
         """
         Initialize ClickHouse hit storage.
         
         Args:
             url: ClickHouse HTTP endpoint
-            buffer_size: Number of events to buffer before bulk insert
+            buffer_size: Maximum number of buffered events per bulk insert
+            flush_interval: Maximum seconds a buffered event waits for its insert
         """
         self.url = url
         self.buffer_size = buffer_size
-        self.buffer: List[HitEvent] = []
-        self.buffer_lock = asyncio.Lock()
-        self._init_database()
+        self.flush_interval = flush_interval
+        self._events: Optional[asyncio.Queue] = None
+        self._flusher_task: Optional[asyncio.Task] = None
+        self._client = httpx.AsyncClient(
+            base_url=url,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+            timeout=5.0,
+        )
+        # Schema is created lazily (_ensure_schema): no network I/O here,
+        # and an unreachable ClickHouse doesn't fail construction
+        self._schema_ready = asyncio.Event()
+        self._schema_lock = asyncio.Lock()
+        self._backfill_tasks: List[asyncio.Task] = []
     
-    def _init_database(self):
+    async def warm_up(self):
+        """Create the schema now instead of on the first query"""
+        await self._ensure_schema()
+    
+    async def _ensure_schema(self):
+        """
+        Run _init_database once; called before every insert and query.
+        
+        Cheap after the first success (an Event check). On failure the
+        event stays unset, so the next call retries.
+        """
+        if self._schema_ready.is_set():
+            return
+        async with self._schema_lock:
+            # Another caller may have created it while we waited
+            if not self._schema_ready.is_set() and await self._init_database():
+                self._schema_ready.set()
+    
+    async def _init_database(self) -> bool:
         """
         Create ClickHouse table if it doesn't exist.
         
@@ -357,82 +608,177 @@ class ClickHouseHitStorage(HitStorageStrategy):
         - Partitioned by month for efficient pruning
         - Ordered by (short_code, timestamp) for fast lookups
         - Bloom filter index on short_code
+        - LowCardinality for country/device_type/browser: a few hundred
+          distinct values, dictionary-encoded (smaller columns, GROUP BY
+          on dictionary positions); the rollup views inherit the type
+        - Materialized views (ROLLUP_VIEWS) holding per-code counts, so
+          breakdown and time-series queries read pre-reduced rows; a view
+          this call creates is backfilled from url_hits in the background
+        
+        Returns:
+            True if the schema exists, False if ClickHouse could not be reached
         """
+        client = self._client
         try:
-            import requests
-            
             # Create database
-            requests.post(
-                f"{self.url}",
-                data="CREATE DATABASE IF NOT EXISTS url_shortener"
-            )
+            (await client.post(
+                "/",
+                content="CREATE DATABASE IF NOT EXISTS url_shortener"
+            )).raise_for_status()
             
             # Create table with optimizations
-            requests.post(
-                f"{self.url}",
-                data="""
+            (await client.post(
+                "/",
+                content="""
                     CREATE TABLE IF NOT EXISTS url_shortener.url_hits (
                         timestamp DateTime,
                         short_code String,
                         ip_address String,
                         user_agent String,
                         referer String,
-                        country String,
-                        device_type String,
-                        browser String,
+                        country LowCardinality(String),
+                        device_type LowCardinality(String),
+                        browser LowCardinality(String),
                         INDEX idx_short_code short_code TYPE bloom_filter GRANULARITY 1
                     )
                     ENGINE = MergeTree()
                     PARTITION BY toYYYYMM(timestamp)
                     ORDER BY (short_code, timestamp)
                 """
-            )
+            )).raise_for_status()
+            
+            # Pre-aggregated rollups, filled on every insert into url_hits.
+            # No IF NOT EXISTS: only the process whose CREATE succeeds
+            # backfills, so concurrent workers can't backfill twice.
+            cutoff = int(time.time()) + self.ROLLUP_CUTOFF_MARGIN
+            for name, (engine, select) in self.ROLLUP_VIEWS.items():
+                response = await client.post(
+                    "/",
+                    content=f"""
+                        CREATE MATERIALIZED VIEW url_shortener.{name}
+                        ENGINE = SummingMergeTree {engine}
+                        AS {select.replace("WHERE_CLAUSE", f"WHERE timestamp >= toDateTime({cutoff})")}
+                    """
+                )
+                if response.headers.get("X-ClickHouse-Exception-Code") == self.TABLE_ALREADY_EXISTS:
+                    continue
+                response.raise_for_status()
+                # Scheduled per view, so a later failure in this loop
+                # doesn't leave an already created view unfilled
+                self._backfill_tasks.append(
+                    asyncio.create_task(self._backfill_rollup(name, cutoff), name=name)
+                )
             
             print("✅ ClickHouse analytics database initialized")
+            return True
             
         except Exception as e:
             print(f"⚠️  ClickHouse initialization failed: {e}")
-            print("Falling back to SQLite for analytics")
+            print("Retrying on next use")
+            return False
+    
+    async def _backfill_rollup(self, name: str, cutoff: int):
+        """
+        Copy hits stamped before cutoff into a newly created rollup view.
+        
+        Runs once, ROLLUP_BACKFILL_DELAY seconds after the cutoff, in the
+        process that created the view. The view itself only counts hits
+        stamped at or after the cutoff, so the two never overlap.
+        
+        Args:
+            name: Rollup view created by this process
+            cutoff: Unix time the view was split on
+        """
+        await asyncio.sleep(max(0, cutoff + self.ROLLUP_BACKFILL_DELAY - time.time()))
+        _, select = self.ROLLUP_VIEWS[name]
+        try:
+            (await self._client.post(
+                "/",
+                content=f"INSERT INTO url_shortener.{name} "
+                        + select.replace("WHERE_CLAUSE", f"WHERE timestamp < toDateTime({cutoff})"),
+                timeout=None,
+            )).raise_for_status()
+            print(f"✅ Backfilled rollup {name}")
+        except Exception as e:
+            print(f"❌ Backfill of rollup {name} failed (cutoff {cutoff}): {e}")
+    
+    async def close(self):
+        """Insert everything still buffered, stop the flusher, close the HTTP client"""
+        for task in self._backfill_tasks:
+            if not task.done():
+                print(f"⚠️  Rollup {task.get_name()} was not backfilled (stopped before its backfill ran)")
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+        self._backfill_tasks = []
+        if self._flusher_task is not None:
+            await self._events.join()
+            self._flusher_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._flusher_task
+            self._flusher_task = None
+            self._events = None
+        await self._client.aclose()
+    
+    async def _select(self, query: str, **parameters) -> List[Dict]:
+        """
+        Run a FORMAT JSON query and return its rows.
+        
+        Values are bound server-side: the query uses {name:Type}
+        placeholders and each value is sent as a param_<name> field,
+        never interpolated into the SQL text.
+        """
+        await self._ensure_schema()
+        params = {f"param_{name}": value for name, value in parameters.items()}
+        response = await self._client.get(
+            "/", params={"query": query, **self.QUERY_SETTINGS, **params}
+        )
+        response.raise_for_status()
+        return response.json().get("data", [])
     
     async def store_hit(self, event: HitEvent) -> bool:
         """
-        Store hit in buffer, flush if buffer is full.
+        Store hit in buffer; a background task inserts it.
         
         This implements write buffering for efficiency:
         - Individual inserts are slow
         - Bulk inserts are 100x faster
+        
+        The flusher inserts a batch when it reaches buffer_size or when
+        flush_interval has passed since its first event, so hits also
+        reach ClickHouse under low traffic. No lock: the caller only
+        enqueues.
         """
-        async with self.buffer_lock:
-            self.buffer.append(event)
-            
-            # Flush if buffer is full
-            if len(self.buffer) >= self.buffer_size:
-                await self._flush_buffer()
+        if self._flusher_task is None:
+            # Started here (not in __init__) so it binds to the running event loop
+            self._events = asyncio.Queue()
+            self._flusher_task = asyncio.create_task(self._flusher())
         
+        self._events.put_nowait(event)
         return True
     
     async def store_hits(self, events: List[HitEvent]) -> bool:
-        """Store multiple events (bulk insert)"""
+        """
+        Store multiple events (bulk insert).
+        
+        The batch is sent column-wise (FORMAT JSONColumns): one attrgetter
+        pass reads all fields, zip(*rows) transposes them into columns and
+        a single orjson.dumps call encodes everything. Strings are escaped
+        properly (tabs/newlines in user agents or referers can't break the
+        format) and no per-field formatting is done in Python.
+        """
         try:
-            import requests
-            
-            # Prepare CSV data for ClickHouse
-            csv_data = "\n".join([
-                f"{event.timestamp.isoformat()}\t"
-                f"{event.short_code}\t"
-                f"{event.ip_address or ''}\t"
-                f"{event.user_agent or ''}\t"
-                f"{event.referer or ''}\t"
-                f"{event.country or ''}\t"
-                f"{event.device_type or ''}\t"
-                f"{event.browser or ''}"
-                for event in events
-            ])
+            await self._ensure_schema()
+            columns = zip(*map(self._ROW_FIELDS, events))
+            body = orjson.dumps(dict(zip(self.INSERT_COLUMNS, columns)))
+            body = gzip.compress(body, compresslevel=self.INSERT_COMPRESSLEVEL)
             
             # Bulk insert via HTTP interface
-            response = requests.post(
-                f"{self.url}/?query=INSERT INTO url_shortener.url_hits FORMAT TabSeparated",
-                data=csv_data
+            response = await self._client.post(
+                "/",
+                params={"query": self.INSERT_QUERY, **self.INSERT_SETTINGS},
+                headers=self.INSERT_HEADERS,
+                content=body
             )
             
             return response.status_code == 200
@@ -441,27 +787,39 @@ class ClickHouseHitStorage(HitStorageStrategy):
             print(f"❌ ClickHouse storage error: {e}")
             return False
     
-    async def _flush_buffer(self):
-        """Flush buffer to ClickHouse"""
-        if not self.buffer:
-            return
-        
-        # Copy buffer and clear it
-        events_to_write = self.buffer.copy()
-        self.buffer.clear()
-        
-        # Write to ClickHouse
-        await self.store_hits(events_to_write)
+    async def _flusher(self):
+        """Insert buffered events on size (buffer_size) or time (flush_interval)"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch: List[HitEvent] = [await self._events.get()]
+            deadline = loop.time() + self.flush_interval
+            
+            while len(batch) < self.buffer_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._events.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            try:
+                await self.store_hits(batch)
+            finally:
+                for _ in batch:
+                    self._events.task_done()
     
     async def get_total_hits(self, short_code: str) -> int:
         """Get total hits (ClickHouse is FAST at COUNT)"""
         try:
-            import requests
-            
-            query = f"SELECT COUNT(*) FROM url_shortener.url_hits WHERE short_code = '{short_code}'"
-            response = requests.get(f"{self.url}/?query={query}")
+            rows = await self._select("""
+                SELECT count() as count
+                FROM url_shortener.url_hits
+                PREWHERE short_code = {short_code:String}
+                FORMAT JSON
+            """, short_code=short_code)
             
-            return int(response.text.strip())
+            return rows[0]["count"]
             
         except Exception as e:
             print(f"❌ ClickHouse query error: {e}")
@@ -470,22 +828,17 @@ class ClickHouseHitStorage(HitStorageStrategy):
     async def get_hits_by_device(self, short_code: str) -> Dict[str, int]:
         """Get hits by device (ClickHouse GROUP BY is blazing fast)"""
         try:
-            import requests
-            
-            query = f"""
-                SELECT device_type, COUNT(*) as count
-                FROM url_shortener.url_hits
-                WHERE short_code = '{short_code}'
-                GROUP BY device_type
+            rows = await self._select("""
+                SELECT device_type, sum(hits) as count
+                FROM url_shortener.url_hits_by_device_type_mv
+                PREWHERE short_code = {short_code:String}
+                GROUP BY short_code, device_type
                 FORMAT JSON
-            """
-            
-            response = requests.get(f"{self.url}/?query={query}")
-            data = response.json()
+            """, short_code=short_code)
             
             return {
                 row["device_type"] or "unknown": row["count"]
-                for row in data.get("data", [])
+                for row in rows
             }
             
         except Exception as e:
@@ -495,22 +848,17 @@ class ClickHouseHitStorage(HitStorageStrategy):
     async def get_hits_by_browser(self, short_code: str) -> Dict[str, int]:
         """Get hits by browser"""
         try:
-            import requests
-            
-            query = f"""
-                SELECT browser, COUNT(*) as count
-                FROM url_shortener.url_hits
-                WHERE short_code = '{short_code}'
-                GROUP BY browser
+            rows = await self._select("""
+                SELECT browser, sum(hits) as count
+                FROM url_shortener.url_hits_by_browser_mv
+                PREWHERE short_code = {short_code:String}
+                GROUP BY short_code, browser
                 FORMAT JSON
-            """
-            
-            response = requests.get(f"{self.url}/?query={query}")
-            data = response.json()
+            """, short_code=short_code)
             
             return {
                 row["browser"] or "unknown": row["count"]
-                for row in data.get("data", [])
+                for row in rows
             }
             
         except Exception as e:
@@ -520,47 +868,57 @@ class ClickHouseHitStorage(HitStorageStrategy):
     async def get_hits_by_country(self, short_code: str) -> Dict[str, int]:
         """Get hits by country"""
         try:
-            import requests
-            
-            query = f"""
-                SELECT country, COUNT(*) as count
-                FROM url_shortener.url_hits
-                WHERE short_code = '{short_code}'
-                GROUP BY country
+            rows = await self._select("""
+                SELECT country, sum(hits) as count
+                FROM url_shortener.url_hits_by_country_mv
+                PREWHERE short_code = {short_code:String}
+                GROUP BY short_code, country
                 FORMAT JSON
-            """
-            
-            response = requests.get(f"{self.url}/?query={query}")
-            data = response.json()
+            """, short_code=short_code)
             
             return {
                 row["country"] or "unknown": row["count"]
-                for row in data.get("data", [])
+                for row in rows
             }
             
         except Exception as e:
             print(f"❌ ClickHouse query error: {e}")
             return {}
     
+    async def get_hits_breakdown(self, short_code: str) -> Dict[str, Dict[str, int]]:
+        """
+        Get device/browser/country breakdowns in one query (one round-trip).
+        
+        UNION ALL over the three rollup views: each branch still reads only
+        pre-aggregated rows for this code.
+        """
+        breakdown: Dict[str, Dict[str, int]] = {
+            column: {} for column in self.BREAKDOWN_COLUMNS
+        }
+        try:
+            rows = await self._select(self.BREAKDOWN_QUERY, short_code=short_code)
+            
+            for row in rows:
+                breakdown[row["dimension"]][row["value"] or "unknown"] = row["count"]
+            
+        except Exception as e:
+            print(f"❌ ClickHouse query error: {e}")
+        
+        return breakdown
+    
     async def get_top_referers(self, short_code: str, limit: int = 10) -> List[Dict]:
         """Get top referers"""
         try:
-            import requests
-            
-            query = f"""
-                SELECT referer, COUNT(*) as count
+            return await self._select("""
+                SELECT referer, count() as count
                 FROM url_shortener.url_hits
-                WHERE short_code = '{short_code}' AND referer != ''
-                GROUP BY referer
+                PREWHERE short_code = {short_code:String}
+                WHERE referer != ''
+                GROUP BY short_code, referer
                 ORDER BY count DESC
-                LIMIT {limit}
+                LIMIT {limit:UInt32}
                 FORMAT JSON
-            """
-            
-            response = requests.get(f"{self.url}/?query={query}")
-            data = response.json()
-            
-            return data.get("data", [])
+            """, short_code=short_code, limit=limit)
             
         except Exception as e:
             print(f"❌ ClickHouse query error: {e}")
@@ -572,30 +930,131 @@ class ClickHouseHitStorage(HitStorageStrategy):
         days: int = 7
     ) -> List[Dict]:
         """Get hits over time (time-series queries are ClickHouse's specialty!)"""
+        # Cutoff computed here instead of now() in SQL: the query cache
+        # doesn't accept non-deterministic functions. The daily rollup has
+        # whole days, so the first day is counted in full.
+        since = (datetime.utcnow() - timedelta(days=days)).date().isoformat()
+        
         try:
-            import requests
-            
-            query = f"""
-                SELECT 
-                    toDate(timestamp) as date,
-                    COUNT(*) as count
-                FROM url_shortener.url_hits
-                WHERE short_code = '{short_code}'
-                  AND timestamp >= now() - INTERVAL {days} DAY
-                GROUP BY date
+            rows = await self._select("""
+                SELECT date, sum(hits) as count
+                FROM url_shortener.url_hits_daily_mv
+                PREWHERE short_code = {short_code:String}
+                WHERE date >= {since:Date}
+                GROUP BY short_code, date
                 ORDER BY date
                 FORMAT JSON
-            """
-            
-            response = requests.get(f"{self.url}/?query={query}")
-            data = response.json()
+            """, short_code=short_code, since=since)
             
             return [
                 {"date": row["date"], "count": row["count"]}
-                for row in data.get("data", [])
+                for row in rows
             ]
             
         except Exception as e:
             print(f"❌ ClickHouse query error: {e}")
             return []
 
+
+class CachedHitStorage(HitStorageStrategy):
+    """
+    Read-through TTL cache in front of another hit storage.
+    
+    Dashboards poll the same popular codes every few seconds; within
+    ttl seconds repeated reads are served from process memory instead of
+    querying SQLite/ClickHouse again.
+    
+    - Entries are grouped per short code; the cache keeps the max_size
+      most recently used codes (LRU)
+    - store_hit/store_hits drop the cached results of the codes written
+      (writes from other processes, e.g. the hit worker, show up after ttl)
+    """
+    
+    def __init__(self, storage: HitStorageStrategy, max_size: int = 4096, ttl: float = 5.0):
+        """
+        Initialize cached hit storage.
+        
+        Args:
+            storage: Storage that answers cache misses and receives writes
+            max_size: Maximum number of short codes with cached results
+            ttl: Lifetime of a cached result in seconds
+        """
+        self.storage = storage
+        self.max_size = max_size
+        self.ttl = ttl
+        # short_code -> {(method, *args): (value, expires_at)}; order = recency
+        self._entries: "OrderedDict[str, Dict[Tuple, Tuple[Any, float]]]" = OrderedDict()
+    
+    async def _cached(self, short_code: str, key: Tuple, load: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached result for (short_code, key), loading it on a miss"""
+        results = self._entries.get(short_code)
+        if results is not None:
+            self._entries.move_to_end(short_code)
+            entry = results.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                return entry[0]
+        
+        value = await load()
+        
+        self._entries.setdefault(short_code, {})[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(short_code)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return value
+    
+    async def store_hit(self, event: HitEvent) -> bool:
+        """Store hit and drop cached results for its code"""
+        self._entries.pop(event.short_code, None)
+        return await self.storage.store_hit(event)
+    
+    async def store_hits(self, events: List[HitEvent]) -> bool:
+        """Store hits and drop cached results for their codes"""
+        for short_code in {event.short_code for event in events}:
+            self._entries.pop(short_code, None)
+        return await self.storage.store_hits(events)
+    
+    async def get_total_hits(self, short_code: str) -> int:
+        return await self._cached(
+            short_code, ("total",), lambda: self.storage.get_total_hits(short_code)
+        )
+    
+    async def get_hits_by_device(self, short_code: str) -> Dict[str, int]:
+        return await self._cached(
+            short_code, ("device",), lambda: self.storage.get_hits_by_device(short_code)
+        )
+    
+    async def get_hits_by_browser(self, short_code: str) -> Dict[str, int]:
+        return await self._cached(
+            short_code, ("browser",), lambda: self.storage.get_hits_by_browser(short_code)
+        )
+    
+    async def get_hits_by_country(self, short_code: str) -> Dict[str, int]:
+        return await self._cached(
+            short_code, ("country",), lambda: self.storage.get_hits_by_country(short_code)
+        )
+    
+    async def get_hits_breakdown(self, short_code: str) -> Dict[str, Dict[str, int]]:
+        return await self._cached(
+            short_code, ("breakdown",), lambda: self.storage.get_hits_breakdown(short_code)
+        )
+    
+    async def get_top_referers(self, short_code: str, limit: int = 10) -> List[Dict]:
+        return await self._cached(
+            short_code, ("referers", limit),
+            lambda: self.storage.get_top_referers(short_code, limit)
+        )
+    
+    async def get_hits_over_time(self, short_code: str, days: int = 7) -> List[Dict]:
+        return await self._cached(
+            short_code, ("over_time", days),
+            lambda: self.storage.get_hits_over_time(short_code, days)
+        )
+    
+    async def warm_up(self):
+        """Warm up the underlying storage"""
+        await self.storage.warm_up()
+    
+    async def close(self):
+        """Close the underlying storage"""
+        self._entries.clear()
+        await self.storage.close()
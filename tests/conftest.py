@@ -3,56 +3,178 @@ Test configuration and fixtures for FastAPI URL shortener.
 This centralizes all test setup, making individual tests clean.
 """
 
+import asyncio
+from itertools import count
 import pytest
-from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import pytest_asyncio
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import event, insert
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.pool import StaticPool
+from shortener_app.config import settings
+
+# Never touch an external Redis from tests (cache.clear() would FLUSHDB it and
+# redirects would XADD into the real stream): pin both backends to memory
+# before the app is imported
+settings.cache_backend = "memory"
+settings.queue_backend = "memory"
+# Same for the database: the app's lifespan runs create_all on the engine
+# built from DATABASE_URL, which must not be the developer's database file.
+# Requests use the test engine below through the get_db override.
+settings.database_url = "sqlite://"
+
 from main import app
 from shortener_app.database.connection import Base, get_db
+from shortener_app.models.url import URL
 
 # Test database configuration
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# In-memory SQLite on a single shared connection (StaticPool): no file I/O,
+# and the schema created once per session stays visible to every test.
+# Each pytest-xdist worker is its own process, so gets its own database.
+SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite://"
+engine = create_async_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
 
 
-@pytest.fixture(scope="function")
-def db_session():
+# pysqlite/aiosqlite begin transactions lazily on their own, which breaks
+# SAVEPOINTs; let SQLAlchemy emit BEGIN itself instead
+@event.listens_for(engine.sync_engine, "connect")
+def _disable_driver_transactions(dbapi_connection, connection_record):
+    dbapi_connection.isolation_level = None
+
+
+@event.listens_for(engine.sync_engine, "begin")
+def _emit_begin(conn):
+    conn.exec_driver_sql("BEGIN")
+
+
+# Session the overridden get_db yields; the client fixture sets it per test
+_current_db_session = None
+
+
+async def override_get_db():
+    """get_db override installed once for the whole test session"""
+    yield _current_db_session
+
+
+@pytest.fixture(scope="session")
+def event_loop():
     """
-    Create a fresh database session for each test.
-    This ensures tests are isolated and don't affect each other.
+    One event loop for the whole test session.
+    
+    pytest-asyncio runs every async test and fixture on it, so the shared
+    database connection and the app's clients are always used from one loop.
+    """
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest_asyncio.fixture(scope="session")
+async def db_connection():
+    """
+    Create the schema once and keep one connection for the whole test session.
+    """
+    conn = await engine.connect()
+    await conn.run_sync(Base.metadata.create_all)
+    await conn.commit()
+    
+    try:
+        yield conn
+    finally:
+        await conn.close()
+        await engine.dispose()
+
+
+@pytest_asyncio.fixture(scope="function")
+async def db_session(db_connection):
     """
-    # Create tables
-    Base.metadata.create_all(bind=engine)
+    Create a database session for each test, rolled back afterwards.
     
-    # Create session
-    db = TestingSessionLocal()
+    The test runs inside an outer transaction; the session's commits only
+    release SAVEPOINTs (join_transaction_mode="create_savepoint"), so
+    rolling back the outer transaction leaves the schema empty for the
+    next test - no create_all/drop_all per test.
+    """
+    transaction = await db_connection.begin()
+    db = AsyncSession(
+        bind=db_connection,
+        expire_on_commit=False,
+        join_transaction_mode="create_savepoint",
+    )
     
     try:
         yield db
     finally:
         # Cleanup
-        db.close()
-        Base.metadata.drop_all(bind=engine)
+        await db.close()
+        await transaction.rollback()
 
 
-@pytest.fixture(scope="function")
-def client(db_session):
+@pytest_asyncio.fixture(scope="session")
+async def app_client():
+    """
+    One HTTP client for the whole test session.
+    
+    Requests go straight to the ASGI app on the test's event loop
+    (ASGITransport - no server, no thread hop like TestClient). The
+    transport doesn't run the lifespan, so it is entered here once
+    (table creation, cache/queue clients, hit buffer).
+    
+    The get_db override is also installed once, here, and removed when
+    the session ends.
+    """
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        async with app.router.lifespan_context(app):
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                yield client
+    finally:
+        app.dependency_overrides.clear()
+
+
+@pytest_asyncio.fixture(scope="function")
+async def client(app_client, db_session):
     """
     Create a test client with database dependency overridden.
     This is the main fixture that tests will use.
-    """
-    def override_get_db():
-        yield db_session
     
-    # Override the database dependency
-    app.dependency_overrides[get_db] = override_get_db
+    The shared client is pointed at this test's db_session; the cache is
+    emptied afterwards because rolled-back rows can reappear with the same
+    short codes in later tests.
+    """
+    global _current_db_session
+    _current_db_session = db_session
     
-    # Create test client
-    with TestClient(app) as test_client:
-        yield test_client
+    yield app_client
     
-    # Clean up overrides
-    app.dependency_overrides.clear()
+    # Clean up session and cached URLs
+    _current_db_session = None
+    await app.state.cache.clear()
 
 
+@pytest.fixture(scope="function")
+def make_url(db_session):
+    """
+    Factory that inserts a URL row directly and returns its short code.
+    
+    Setup for tests that read, redirect or delete a URL: one INSERT ...
+    RETURNING instead of a POST through the API. Tests that check URL
+    creation itself keep using POST /api/v1/urls/.
+    """
+    codes = (f"t{n}" for n in count())
+    
+    async def _make_url(long_url: str) -> str:
+        stmt = (
+            insert(URL)
+            .values(long_url=long_url, short_code=next(codes), total_hits=0, is_active=True)
+            .returning(URL.short_code)
+        )
+        short_code = (await db_session.execute(stmt)).scalar_one()
+        await db_session.commit()
+        return short_code
+    
+    return _make_url
@@ -1,17 +1,22 @@
 """
 Tests for short code generation strategies.
 """
+
+import pytest
+
+from shortener_app.models.url import URL
 from shortener_app.services.short_code_strategies import (
     RandomShortCodeStrategy,
-    Base62ShortCodeStrategy
+    Base62ShortCodeStrategy,
+    Base64UrlShortCodeStrategy
 )
 from shortener_app.services.short_code_factory import (
     ShortCodeFactory,
-    ShortCodeStrategyType
+    ShortCodeStrategyType,
+    get_default_strategy
 )
 
 
-
 class TestBase62Strategy:
     """Test Base62 encoding strategy"""
     
@@ -21,7 +26,7 @@ class TestBase62Strategy:
         
         code = strategy.generate(url_id=1, db_session=db_session)
         
-        assert len(code) <= 5
+        assert len(code) <= strategy.max_length
 
     
     def test_same_id_same_code(self, db_session):
@@ -57,6 +62,44 @@ class TestBase62Strategy:
         assert code_no_salt != code_with_salt
 
 
+class TestRandomStrategy:
+    """Test random generation strategy"""
+
+    @pytest.mark.asyncio
+    async def test_generate_skips_taken_codes(self, db_session):
+        """Test the batched IN check returns a candidate that isn't taken"""
+        strategy = RandomShortCodeStrategy(length=1, max_retries=500)
+        taken = strategy.characters[1:]
+        db_session.add_all(
+            URL(long_url="https://www.example.com/", short_code=code) for code in taken
+        )
+        await db_session.commit()
+
+        code = await db_session.run_sync(lambda session: strategy.generate(0, session))
+
+        # Only one of the 62 one-character codes is still free
+        assert code == strategy.characters[0]
+
+
+class TestBase64UrlStrategy:
+    """Test Base64-url encoding strategy"""
+
+    def test_encodes_six_bits_per_character(self, db_session):
+        """Test codes match the URL-safe Base64 alphabet"""
+        strategy = Base64UrlShortCodeStrategy(salt=0, max_length=5)
+
+        assert strategy.generate(url_id=63, db_session=db_session) == "_"
+        assert strategy.generate(url_id=64, db_session=db_session) == "BA"
+        assert strategy.generate(url_id=64 ** 5 - 1, db_session=db_session) == "_____"
+
+    def test_unique_codes(self, db_session):
+        """Test different IDs produce different codes"""
+        strategy = Base64UrlShortCodeStrategy(salt=1256, max_length=5)
+
+        codes = {strategy.generate(url_id, db_session) for url_id in range(1, 1001)}
+        assert len(codes) == 1000
+
+
 class TestShortCodeFactory:
     """Test strategy factory"""
     
@@ -70,15 +113,20 @@ class TestShortCodeFactory:
         strategy = ShortCodeFactory.create_strategy(ShortCodeStrategyType.BASE62)
         assert isinstance(strategy, Base62ShortCodeStrategy)
 
+    def test_creates_base64url_strategy(self):
+        """Test factory creates Base64-url strategy"""
+        strategy = ShortCodeFactory.create_strategy(ShortCodeStrategyType.BASE64URL)
+        assert isinstance(strategy, Base64UrlShortCodeStrategy)
+
     def test_creates_default_from_settings(self):
         """Test factory uses settings when no type specified"""
         strategy = ShortCodeFactory.create_strategy()
         # Should create whatever is configured in settings (base62 by default)
         assert strategy is not None
 
-
-from shortener_app.services.short_code_strategies import Base62ShortCodeStrategy
-from shortener_app.models.url import URL
+    def test_default_strategy_is_cached_instance(self):
+        """Test the import-time default is the factory's cached instance"""
+        assert get_default_strategy() is ShortCodeFactory.create_strategy()
 
 
 class TestBase62EdgeCases:
@@ -91,7 +139,7 @@ class TestBase62EdgeCases:
         code = strategy.generate(url_id=1, db_session=db_session)
 
         # Should generate valid code
-        assert len(code) <= 5
+        assert len(code) <= strategy.max_length
         assert code.isalnum()
         print(f"ID 1: {code}")
 
@@ -103,7 +151,7 @@ class TestBase62EdgeCases:
         for url_id in range(1, 101):
             code = strategy.generate(url_id, db_session)
             codes.add(code)
-            assert len(code) <= 5
+            assert len(code) <= strategy.max_length
 
         # All should be unique
         assert len(codes) == 100
@@ -115,7 +163,7 @@ class TestBase62EdgeCases:
 
         code = strategy.generate(url_id=1000, db_session=db_session)
 
-        assert len(code) <= 5
+        assert len(code) <= strategy.max_length
         print(f"ID 1,000: {code}")
 
     def test_ten_thousand_urls(self, db_session):
@@ -124,7 +172,7 @@ class TestBase62EdgeCases:
 
         code = strategy.generate(url_id=10000, db_session=db_session)
 
-        assert len(code) <= 5
+        assert len(code) <= strategy.max_length
         print(f"ID 10,000: {code}")
 
     def test_hundred_thousand_urls(self, db_session):
@@ -133,7 +181,7 @@ class TestBase62EdgeCases:
 
         code = strategy.generate(url_id=100000, db_session=db_session)
 
-        assert len(code) <= 5
+        assert len(code) <= strategy.max_length
         print(f"ID 100,000: {code}")
 
     def test_one_million_urls(self, db_session):
@@ -142,7 +190,7 @@ class TestBase62EdgeCases:
 
         code = strategy.generate(url_id=1000000, db_session=db_session)
 
-        assert len(code) <= 5
+        assert len(code) <= strategy.max_length
         print(f"ID 1,000,000: {code}")
 
     def test_ten_million_urls(self, db_session):
@@ -152,7 +200,7 @@ class TestBase62EdgeCases:
         # This might exceed 5 characters depending on salt
         try:
             code = strategy.generate(url_id=10000000, db_session=db_session)
-            assert len(code) <= 5
+            assert len(code) <= strategy.max_length
             print(f"ID 10,000,000: {code} (still fits!)")
         except ValueError as e:
             print(f"ID 10,000,000: Exceeded max length as expected: {e}")
@@ -0,0 +1,106 @@
+"""
+Tests for queue message models and the hit event buffer.
+"""
+
+import orjson
+import pytest
+
+from shortener_app.queue.buffer import HitEventBuffer
+from shortener_app.queue.models import HitEvent
+from shortener_app.queue.strategies import InMemoryQueue
+
+
+class TestHitEvent:
+    """Test HitEvent serialization round-trips"""
+
+    def test_round_trip(self):
+        """Test from_dict reads what to_json writes"""
+        event = HitEvent(short_code="abc12", ip_address="192.168.1.1", browser="Chrome")
+
+        parsed = HitEvent.from_dict(orjson.loads(event.to_json()), message_id="1-0")
+
+        assert parsed.short_code == "abc12"
+        assert parsed.timestamp == event.timestamp
+        assert parsed.browser == "Chrome"
+        assert parsed.message_id == "1-0"
+
+    def test_parses_pydantic_era_payload(self):
+        """Test payloads from the old Pydantic model (message_id: null) still parse"""
+        payload = (
+            b'{"short_code":"abc12","timestamp":"2025-10-29T10:30:00Z",'
+            b'"ip_address":"192.168.1.1","user_agent":null,"referer":null,'
+            b'"country":"US","device_type":"desktop","browser":"Chrome",'
+            b'"message_id":null}'
+        )
+
+        event = HitEvent.from_dict(orjson.loads(payload), message_id="1-0")
+
+        assert event.short_code == "abc12"
+        assert event.country == "US"
+        assert event.message_id == "1-0"
+        assert event.timestamp.year == 2025
+
+    def test_ignores_unknown_keys(self):
+        """Test keys that are not event fields are dropped"""
+        event = HitEvent.from_dict({"short_code": "abc12", "extra": 1})
+
+        assert event.short_code == "abc12"
+
+
+class FailingBatchQueue(InMemoryQueue):
+    """In-memory queue whose batch publish fails"""
+
+    async def publish_batch(self, queue_name, messages):
+        return False
+
+
+@pytest.mark.asyncio
+class TestHitEventBuffer:
+    """Test the buffer's handling of failed batch publishes"""
+
+    async def test_publishes_buffered_events(self):
+        """Test stop() publishes everything still buffered"""
+        queue = InMemoryQueue()
+        buffer = HitEventBuffer(queue, "hits")
+        buffer.start()
+
+        for code in ("a", "b", "c"):
+            await buffer.put(HitEvent(short_code=code))
+        await buffer.stop()
+
+        assert await queue.get_queue_length("hits") == 3
+        assert buffer.dropped == 0
+
+    async def test_counts_failed_batch_as_dropped(self):
+        """Test a failed batch is counted, not re-published event by event"""
+        queue = FailingBatchQueue()
+        buffer = HitEventBuffer(queue, "hits")
+        buffer.start()
+
+        for code in ("a", "b"):
+            await buffer.put(HitEvent(short_code=code))
+        await buffer.stop()
+
+        assert buffer.dropped == 2
+        assert await queue.get_queue_length("hits") == 0
+
+
+class FailingAckQueue(InMemoryQueue):
+    """In-memory queue whose acks fail"""
+
+    async def ack(self, queue_name, message_ids):
+        return False
+
+
+@pytest.mark.asyncio
+class TestConsumeAndAck:
+    """Test acks that fail are reported to the caller"""
+
+    async def test_failed_ack_raises(self):
+        """Test consume_and_ack raises instead of dropping the ack"""
+        queue = FailingAckQueue()
+
+        with pytest.raises(RuntimeError):
+            await queue.consume_and_ack("hits", ["1-0"], block_time=10)
+
+        assert await queue.consume_and_ack("hits", [], block_time=10) == []
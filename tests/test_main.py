@@ -1,13 +1,11 @@
 import pytest
-from fastapi.testclient import TestClient
-from main import app
+from httpx import AsyncClient
 
-client = TestClient(app)
 
-
-def test_read_root():
+@pytest.mark.asyncio
+async def test_read_root(app_client: AsyncClient):
     """Test root endpoint"""
-    response = client.get("/")
+    response = await app_client.get("/")
     assert response.status_code == 200
     data = response.json()
     assert "message" in data
@@ -15,9 +13,10 @@ def test_read_root():
     assert "docs" in data
 
 
-def test_health_check():
+@pytest.mark.asyncio
+async def test_health_check(app_client: AsyncClient):
     """Test health check endpoint"""
-    response = client.get("/health")
+    response = await app_client.get("/health")
     assert response.status_code == 200
     data = response.json()
     assert data["status"] == "healthy"